@@ -0,0 +1,81 @@
+import dataclasses
+import random
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.models.score_entry import ScoreEntry
+from src.services.vocabulary import Vocabulary, VocabularyLoader
+
+# data/units.csvがない環境で使う部署の一覧
+FALLBACK_UNITS = [f"部署{i}" for i in range(1, 13)]
+# 社内の割合
+INTERNAL_RATIO = 0.7
+# 年齢の一覧（ages.csvの順）に対する重み（20〜40代が多い想定）
+AGE_WEIGHTS = [0.05, 0.01, 0.04, 0.25, 0.3, 0.2, 0.1, 0.04, 0.01]
+# スコアの分布（平均と標準偏差）
+SCORE_MEAN = 30
+SCORE_STD = 12
+
+
+def load_vocabulary(directory: str = "data") -> Vocabulary:
+    """data/ の選択肢を読み込む（部署がない場合は代わりの一覧を使う）"""
+    vocabulary = VocabularyLoader(directory).load()
+    if vocabulary.units:
+        return vocabulary
+    return dataclasses.replace(vocabulary, units=FALLBACK_UNITS)
+
+
+def generate_frame(
+    size: int, vocabulary: Vocabulary, seed: Optional[int] = 0
+) -> pd.DataFrame:
+    """score.csvと同じ列を持つ合成データ
+
+    ニックネームは語彙からの重複ありの無作為抽出（実際のアプリでは重複しないが、
+    語彙の組み合わせ数より多い件数を作るため）。
+    """
+    rng = np.random.default_rng(seed)
+    is_internal = rng.random(size) < INTERNAL_RATIO
+    units = np.array(vocabulary.units, dtype=object)
+    ages = np.array(vocabulary.ages, dtype=object)
+    weights = np.resize(np.array(AGE_WEIGHTS, dtype=float), len(ages))
+    scores = np.clip(np.rint(rng.normal(SCORE_MEAN, SCORE_STD, size)), 0, None)
+    return pd.DataFrame(
+        {
+            "adjective": rng.choice(
+                np.array(vocabulary.adjectives, dtype=object), size
+            ),
+            "animal": rng.choice(np.array(vocabulary.animals, dtype=object), size),
+            "score": scores.astype(np.int64),
+            "is_internal": np.where(is_internal, "true", "false"),
+            "unit": np.where(is_internal, rng.choice(units, size), None),
+            "age": rng.choice(ages, size, p=weights / weights.sum()),
+        }
+    )
+
+
+def write_csv(df: pd.DataFrame, file_path: str) -> None:
+    """score.csvと同じ形式で書き出す"""
+    df.to_csv(file_path, index=False, lineterminator="\n")
+
+
+def generate_entries(
+    count: int, vocabulary: Vocabulary, seed: Optional[int] = 0
+) -> List[ScoreEntry]:
+    """save_scoreなどで1件ずつ使うエントリ"""
+    rng = random.Random(seed)
+    entries = []
+    for _ in range(count):
+        is_internal = rng.random() < INTERNAL_RATIO
+        entries.append(
+            ScoreEntry(
+                adjective=rng.choice(vocabulary.adjectives),
+                animal=rng.choice(vocabulary.animals),
+                category="社内" if is_internal else "社外",
+                score=max(0, round(rng.gauss(SCORE_MEAN, SCORE_STD))),
+                unit=rng.choice(vocabulary.units) if is_internal else None,
+                age=rng.choice(vocabulary.ages),
+            )
+        )
+    return entries
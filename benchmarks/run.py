@@ -0,0 +1,208 @@
+"""ヘッドレスで主要な処理の実行時間を計測し、JSONで出力する
+
+使い方:
+    uv run python -m benchmarks.run --sizes 1000 10000 --output bench.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import streamlit.logger
+
+from src.repositories.score_repository import CSVScoreRepository
+from src.repositories.snapshot_score_repository import SnapshotScoreRepository
+from src.services.leaderboard_view import LeaderboardViewCache, LeaderboardViewModel
+from src.services.leaderboard_window import leaderboard_rows
+from src.services.score_filter import FacetIndex, ScoreFilterService
+from src.services.score_histogram import ScoreHistogram
+from src.services.score_statistics import ScoreStatistics
+from src.services.segment_leaderboard import SegmentLeaderboards
+from src.services.vocabulary import Vocabulary
+from src.ui.leaderboard_ui import LeaderboardUI
+
+from .data_generator import (
+    generate_entries,
+    generate_frame,
+    load_vocabulary,
+    write_csv,
+)
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+# save_scoreで1回の計測に追記する件数
+SAVE_BATCH = 100
+
+
+def measure(func: Callable[[], object], repeat: int) -> Dict[str, float]:
+    """funcをrepeat回実行した所要時間（秒）の要約"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return {
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.fmean(timings),
+        "max": max(timings),
+    }
+
+
+def run_size(
+    size: int,
+    ui: LeaderboardUI,
+    vocabulary: Vocabulary,
+    repeat: int,
+    seed: int,
+    work_dir: str,
+) -> List[dict]:
+    """1つのデータ件数で全ての項目を計測"""
+    csv_path = os.path.join(work_dir, f"score_{size}.csv")
+    write_csv(generate_frame(size, vocabulary, seed), csv_path)
+
+    repository = CSVScoreRepository(csv_path)
+    table = repository.load_table()
+    snapshot_dir = os.path.join(work_dir, f"snapshot_{size}")
+    SnapshotScoreRepository(csv_path, snapshot_dir).compact()
+    entries = generate_entries(SAVE_BATCH, vocabulary, seed)
+    filters = {
+        "selected_categories": {"社内"},
+        "selected_units": set(vocabulary.units[:2]),
+        "selected_ages": set(vocabulary.ages[3:5]),
+    }
+    highlight = table[len(table) // 2]
+    view_cache = LeaderboardViewCache()
+    # ストアと同じく索引は1回だけ作り、絞り込みだけを計測する
+    # （索引の作成はfilter.build_indexで計測）
+    facet_index = FacetIndex(table)
+
+    def save_scores():
+        save_repository = CSVScoreRepository(csv_path)
+        for entry in entries:
+            save_repository.save_score(entry)
+
+    cases = {
+        "repository.load_scores": lambda: CSVScoreRepository(csv_path).load_scores(),
+        "repository.load_table": lambda: CSVScoreRepository(csv_path).load_table(),
+        "repository.load_table[snapshot]": lambda: SnapshotScoreRepository(
+            csv_path, snapshot_dir
+        ).load_table(),
+        f"repository.save_score[x{SAVE_BATCH}]": save_scores,
+        "statistics.calculate_statistics": lambda: ScoreStatistics(
+            table
+        ).calculate_statistics(),
+        "statistics.calculate_rank": lambda: ScoreStatistics(table).calculate_rank(
+            highlight
+        ),
+        "filter.build_index": lambda: FacetIndex(table),
+        "filter.filter_scores": lambda: ScoreFilterService(table).filter_scores(
+            **filters
+        ),
+        "filter.filter_scores[index]": lambda: ScoreFilterService(
+            table, facet_index
+        ).filter_scores(**filters),
+        "filter.get_unique_values": lambda: _unique_values(ScoreFilterService(table)),
+        "leaderboard.rows": lambda: leaderboard_rows(
+            table.scores,
+            LeaderboardUI.LEADERBOARD_TOP_K,
+            len(table) // 2,
+            LeaderboardUI.LEADERBOARD_WINDOW,
+        ),
+        "leaderboard.histogram": lambda: (
+            ScoreHistogram(table.scores)
+            .bins(LeaderboardUI.HISTOGRAM_MAX_BARS)
+            .to_frame()
+        ),
+        "segments.build": lambda: _segment_summaries(SegmentLeaderboards(table)),
+        "leaderboard.view_model": lambda: LeaderboardViewModel.build(
+            table,
+            top_k=LeaderboardUI.LEADERBOARD_TOP_K,
+            max_bars=LeaderboardUI.HISTOGRAM_MAX_BARS,
+        ),
+        "ui.show_leaderboard": lambda: ui.show_leaderboard(table, highlight),
+        # 同じデータの再実行（表示内容とグラフをキャッシュから使う）
+        "ui.show_leaderboard[cached]": lambda: ui.show_leaderboard(
+            table, highlight, version=size, view_cache=view_cache
+        ),
+    }
+
+    results = []
+    for name, func in cases.items():
+        timing = measure(func, repeat)
+        results.append({"name": name, "size": size, "repeat": repeat, **timing})
+        print(
+            f"{size:>9} {name:<40} median {timing['median'] * 1000:10.2f} ms",
+            file=sys.stderr,
+        )
+    return results
+
+
+def _unique_values(service: ScoreFilterService) -> None:
+    service.get_unique_categories()
+    service.get_unique_units()
+    service.get_unique_ages()
+
+
+def _segment_summaries(segments: SegmentLeaderboards) -> None:
+    for facet in segments.FACETS:
+        segments.summaries(facet)
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="リーダーボードのベンチマーク")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="結果のJSONの出力先（省略時は標準出力）")
+    args = parser.parse_args(argv)
+
+    vocabulary = load_vocabulary()
+    ui = LeaderboardUI()
+    # ブラウザなし（bare mode）で描画関数を呼ぶときの警告を抑える
+    # （設定の読み込みでログレベルが戻るため、最初の描画の後に設定する）
+    streamlit.logger.set_log_level("error")
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for size in args.sizes:
+            results.extend(
+                run_size(size, ui, vocabulary, args.repeat, args.seed, work_dir)
+            )
+
+    report = {
+        "commit": _git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "results": results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,20 +1,132 @@
+import os
+import uuid
+from pathlib import Path
+
 import streamlit as st
 
-from .repositories.score_repository import CSVScoreRepository
+from .models.score_entry import DEFAULT_GAME
+from .repositories.score_repository import (
+    CSVScoreRepository,
+    DuplicateNicknameError,
+    ScoreRepositoryInterface,
+    ScoreSaveError,
+)
+from .repositories.snapshot_score_repository import SnapshotScoreRepository
+from .repositories.sqlite_score_repository import SQLiteScoreRepository
+from .repositories.write_behind_repository import WriteBehindScoreRepository
+from .services.leaderboard_view import LeaderboardViewCache
+from .services.phase_timing import PhaseTimer, TimingLog
 from .services.score_statistics import ScoreStatistics
+from .services.score_store import ScoreStore
+from .services.score_store_pool import ScoreStorePool
+from .services.vocabulary import VocabularyLoader
 from .ui.leaderboard_ui import LeaderboardUI
 
 BODY_FONT_SIZE = 15
 ALERT_FONT_SIZE = 15
 DATAFRAME_FONT_SIZE = 20
+# 他プロセスが追記したスコアを確認する間隔（秒）
+REFRESH_INTERVAL_SECONDS = 3.0
+# スコアの保存先（"csv"、"sqlite" または "snapshot"）
+STORAGE_BACKEND = os.environ.get("LEADERBOARD_STORAGE", "csv")
+# "1"なら保存を裏のスレッドで行う（登録時にディスクへの書き込みを待たない）
+WRITE_BEHIND = os.environ.get("LEADERBOARD_WRITE_BEHIND") == "1"
+# 処理区間ごとの所要時間の計測
+# （"1"で有効。結果はlogs/timing.jsonlと?debug=1のサイドバー）
+TIMING_ENABLED = os.environ.get("LEADERBOARD_TIMING") == "1"
+# 計測時に区間ごとのメモリ増加量も記録するか（tracemallocを使うため遅くなる）
+TIMING_ALLOCATIONS = os.environ.get("LEADERBOARD_TIMING_ALLOCATIONS") == "1"
+# 提案したニックネームを他の端末に提案せずに押さえておく時間（秒）
+NICKNAME_RESERVATION_SECONDS = 600.0
+# メモリに保持するゲームの数と、
+# スコアのテーブルの合計サイズの上限（MB、未指定なら無制限）
+MAX_LOADED_GAMES = int(os.environ.get("LEADERBOARD_MAX_GAMES", "4"))
+MAX_LOADED_MB = os.environ.get("LEADERBOARD_MAX_MEMORY_MB")
+# 新しいスコアを自動で表示するための確認間隔
+# （秒、0なら無効。URLの?refresh=で画面ごとに指定可）
+AUTO_REFRESH_SECONDS = float(os.environ.get("LEADERBOARD_AUTO_REFRESH_SECONDS", "0"))
+MIN_AUTO_REFRESH_SECONDS = 1.0
+
+
+def data_directory(game: str) -> Path:
+    """ゲームのスコアの保存先（既定のゲームは以前と同じdata/直下）"""
+    if game == DEFAULT_GAME:
+        return Path("data")
+    if not game or game in (".", "..") or "/" in game or "\\" in game:
+        raise ValueError(f"ゲーム名に使えない文字が含まれています: {game!r}")
+    return Path("data") / "games" / game
+
+
+def create_repository(game: str = DEFAULT_GAME) -> ScoreRepositoryInterface:
+    """設定に応じたゲームごとのリポジトリを生成"""
+    directory = data_directory(game)
+    csv_path = str(directory / "score.csv")
+    if STORAGE_BACKEND == "sqlite":
+        repository = SQLiteScoreRepository(str(directory / "score.db"), game=game)
+    elif STORAGE_BACKEND == "snapshot":
+        repository = SnapshotScoreRepository(
+            csv_path, str(directory / "snapshot"), game=game
+        )
+    else:
+        repository = CSVScoreRepository(csv_path, game=game)
+    if WRITE_BEHIND:
+        return WriteBehindScoreRepository(repository, str(directory / "score.journal"))
+    return repository
+
+
+def create_store(game: str) -> ScoreStore:
+    return ScoreStore(create_repository(game), NICKNAME_RESERVATION_SECONDS)
+
+
+@st.cache_resource(show_spinner=False)
+def get_store_pool() -> ScoreStorePool:
+    """全セッションで共有するゲームごとのスコアストア"""
+    max_bytes = int(float(MAX_LOADED_MB) * 1024 * 1024) if MAX_LOADED_MB else None
+    return ScoreStorePool(create_store, MAX_LOADED_GAMES, max_bytes)
+
+
+@st.cache_resource(show_spinner=False)
+def get_vocabulary_loader() -> VocabularyLoader:
+    """全セッションで共有する選択肢の読み込み"""
+    return VocabularyLoader()
+
+
+@st.cache_resource(show_spinner=False)
+def get_view_cache() -> LeaderboardViewCache:
+    """全セッションで共有するリーダーボードの表示内容のキャッシュ"""
+    return LeaderboardViewCache()
+
+
+@st.cache_resource(show_spinner=False)
+def get_timing_log() -> TimingLog:
+    """全セッションの計測結果の集計"""
+    return TimingLog()
 
 
 class LeaderboardApp:
     def __init__(self):
-        self.repository = CSVScoreRepository()
-        self.ui = LeaderboardUI()
-        if "scores" not in st.session_state:
-            st.session_state["scores"] = self.repository.load_scores()
+        self.timer = PhaseTimer(TIMING_ENABLED, TIMING_ALLOCATIONS)
+        self.vocabulary_loader = get_vocabulary_loader()
+        # 表示するゲーム（URLの?game=で指定、なければ一覧の先頭）
+        self.games = self.vocabulary_loader.load().games or [DEFAULT_GAME]
+        game = st.query_params.get("game")
+        self.game = game if game in self.games else self.games[0]
+        self.ui = LeaderboardUI(self.timer, self.game)
+        with self.timer.span("load"):
+            self.store = get_store_pool().get(self.game)
+        # ゲームを切り替えたら、前のゲームの入力状態を引き継がない
+        if st.session_state.get("game") != self.game:
+            st.session_state["game"] = self.game
+            for key in (
+                "last_entry",
+                "selected_nickname",
+                "nickname_options",
+                "adjective_animal_map",
+            ):
+                st.session_state.pop(key, None)
+        # ニックネームの予約に使うセッションの識別子
+        if "session_id" not in st.session_state:
+            st.session_state["session_id"] = uuid.uuid4().hex
         if "last_entry" not in st.session_state:
             st.session_state["last_entry"] = None
         if "selected_nickname" not in st.session_state:
@@ -45,28 +157,47 @@ class LeaderboardApp:
         )
 
     def run(self):
-        scores = st.session_state["scores"]
-        stats = ScoreStatistics(scores)
+        with self.timer.span("refresh"):
+            self.store.refresh(max_age=REFRESH_INTERVAL_SECONDS)
+        scores = self.store.scores
+        stats = ScoreStatistics(scores, histogram=self.store.histogram)
 
         # フォーム送信後の再読み込み時に、セッション状態から最後のエントリを復元
-        if st.session_state["selected_nickname"] and not st.session_state["last_entry"]:
-            # セッション状態から最後に選択されたニックネーム情報を取得
-            adjective = st.session_state["selected_adjective"]
-            animal = st.session_state["selected_animal"]
+        with self.timer.span("restore_entry"):
+            if (
+                st.session_state["selected_nickname"]
+                and not st.session_state["last_entry"]
+            ):
+                # セッション状態から最後に選択されたニックネーム情報を取得
+                adjective = st.session_state["selected_adjective"]
+                animal = st.session_state["selected_animal"]
 
-            # 最後のエントリを探す
-            for entry in reversed(scores):
-                if entry.adjective == adjective and entry.animal == animal:
-                    st.session_state["last_entry"] = entry
-                    break
+                # 最後のエントリを索引から引く
+                row = self.store.entry_index.latest(scores, adjective, animal)
+                if row is not None:
+                    st.session_state["last_entry"] = scores[row]
 
         # スコア入力フォームの表示と処理
-        new_entry = self.ui.show_entry_form(scores)
+        with self.timer.span("entry_form"):
+            self.ui.show_game_selector(self.games)
+            vocabulary = self.vocabulary_loader.load()
+            new_entry = self.ui.show_entry_form(
+                scores,
+                vocabulary,
+                self.store.nickname_index,
+                lambda count: self.store.suggest_nicknames(
+                    vocabulary.adjectives,
+                    vocabulary.animals,
+                    st.session_state["session_id"],
+                    count,
+                ),
+            )
 
         # 統計情報の表示（new_entryがNoneの時のみ表示）
-        if not new_entry and scores:
-            if stats_result := stats.calculate_statistics():
-                self.ui.show_statistics(stats_result)
+        with self.timer.span("statistics"):
+            if not new_entry and scores:
+                if stats_result := self.store.calculate_statistics():
+                    self.ui.show_statistics(stats_result)
 
         # 新しいエントリの処理
         if new_entry:
@@ -81,13 +212,31 @@ class LeaderboardApp:
                 st.session_state["selected_animal"] = new_entry.animal
                 st.session_state["selected_nickname"] = new_entry.nickname
 
-            self.repository.save_score(new_entry)
-            st.session_state["scores"].append(new_entry)
-            st.session_state["last_entry"] = new_entry
+            with self.timer.span("save"):
+                try:
+                    self.store.add_unique(new_entry, st.session_state["session_id"])
+                except DuplicateNicknameError:
+                    # 他の端末が先に登録した場合は、選び直してもらう
+                    self.ui.show_duplicate_nickname(new_entry.nickname)
+                    st.session_state["selected_nickname"] = None
+                    st.session_state["selected_adjective"] = None
+                    st.session_state["selected_animal"] = None
+                    new_entry = None
+                except ScoreSaveError:
+                    # 保存できなかったスコアは順位に含めず、もう一度登録してもらう
+                    self.ui.show_save_error()
+                    new_entry = None
+                else:
+                    st.session_state["last_entry"] = new_entry
 
-            # ランキング計算と結果表示
-            rank, total = stats.calculate_rank(new_entry)
-            self.ui.show_rank_result(rank, total)
+                    # ランキング計算と結果表示
+                    rank, total = self.store.calculate_rank(new_entry)
+                    self.ui.show_rank_result(
+                        rank,
+                        total,
+                        stats.quantiles().top_percent(new_entry.score),
+                        self.store.segment_histograms.ranks(new_entry),
+                    )
 
             # フォーム送信後は、nickname_optionsをリセットして新しい選択肢を生成させる
             if "nickname_options" in st.session_state:
@@ -95,17 +244,78 @@ class LeaderboardApp:
                 st.session_state.pop("adjective_animal_map")
 
         # リーダーボードの表示
-        self.ui.show_leaderboard(
-            scores=st.session_state["scores"],
-            highlight_entry=st.session_state["last_entry"],
-        )
+        with self.timer.span("leaderboard"):
+            stamp, latest_scores = self.store.snapshot()
+            self.ui.show_leaderboard(
+                scores=latest_scores,
+                highlight_entry=st.session_state["last_entry"],
+                facet_index=self.store.facet_index,
+                histogram=self.store.histogram,
+                version=stamp,
+                view_cache=get_view_cache(),
+                entry_index=self.store.entry_index,
+            )
+            # 表示したデータの版（自動更新で変更の有無を判定する）
+            st.session_state["rendered_stamp"] = stamp
+
+        # 部署・年齢ごとの成績（集計はストアが追加のたびに更新している）
+        with self.timer.span("segments"):
+            segment_leaderboards = self.store.segment_leaderboards
+            self.ui.show_segment_leaderboards(
+                {
+                    facet: segment_leaderboards.summaries(facet)
+                    for facet in segment_leaderboards.FACETS
+                }
+            )
+
+        interval = self._auto_refresh_seconds()
+        if interval:
+            watch_for_updates(self.game, interval)
 
-        # リーダーボード表示後、選択状態をクリアするのは、新しいエントリが追加された場合のみ
+        # リーダーボード表示後、選択状態をクリアするのは、
+        # 新しいエントリが追加された場合のみ
         if new_entry:
             st.session_state["selected_nickname"] = None
             st.session_state["selected_adjective"] = None
             st.session_state["selected_animal"] = None
 
+        # 計測結果を集計に加え、デバッグ用のパネルに表示
+        if self.timer.enabled:
+            timing_log = get_timing_log()
+            timing_log.record(self.timer)
+            self.ui.show_timing_panel(timing_log.percentiles())
+
+    def _auto_refresh_seconds(self) -> float:
+        """自動更新の確認間隔（URLの?refresh=秒数が環境変数の設定より優先）"""
+        value = st.query_params.get("refresh")
+        if value is None:
+            seconds = AUTO_REFRESH_SECONDS
+        else:
+            try:
+                seconds = float(value)
+            except ValueError:
+                seconds = AUTO_REFRESH_SECONDS
+        if seconds <= 0:
+            return 0.0
+        return max(seconds, MIN_AUTO_REFRESH_SECONDS)
+
+
+def watch_for_updates(game: str, interval: float) -> None:
+    """interval秒ごとにデータの版だけを確認し、変わっていたら再実行する
+
+    確認はフラグメントの中で行うため、変更がない間は画面を描き直さない。
+    他プロセスの追記は差分だけを取り込み、変更後の表示内容は全セッションで1回だけ計算する。
+    """
+
+    @st.fragment(run_every=interval)
+    def poll():
+        store = get_store_pool().get(game)
+        store.refresh(max_age=REFRESH_INTERVAL_SECONDS)
+        if store.stamp != st.session_state.get("rendered_stamp"):
+            st.rerun()
+
+    poll()
+
 
 def main():
     app = LeaderboardApp()
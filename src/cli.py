@@ -0,0 +1,63 @@
+import argparse
+import time
+
+from .repositories.score_repository import CSVScoreRepository
+from .repositories.snapshot_score_repository import SnapshotScoreRepository
+from .repositories.sqlite_score_repository import SQLiteScoreRepository
+
+
+def migrate_sqlite(args: argparse.Namespace) -> None:
+    """CSVのスコアをSQLiteに移行"""
+    repository = SQLiteScoreRepository(args.db)
+    count = repository.migrate_from(CSVScoreRepository(args.csv))
+    if count:
+        print(f"{count}件のスコアを{args.db}に移行しました")
+    else:
+        print(f"{args.db}には既にスコアがあるため、移行しませんでした")
+
+
+def compact(args: argparse.Namespace) -> None:
+    """CSVのスコアをバイナリのスナップショットにまとめる"""
+    repository = SnapshotScoreRepository(args.csv, args.snapshot_dir)
+    while True:
+        start = time.perf_counter()
+        count = repository.compact()
+        elapsed = time.perf_counter() - start
+        print(
+            f"{count}件のスコアを{args.snapshot_dir}にまとめました（{elapsed:.2f}秒）"
+        )
+        if not args.interval:
+            return
+        time.sleep(args.interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="成績表の管理コマンド")
+    subparsers = parser.add_subparsers(required=True)
+
+    migrate_parser = subparsers.add_parser(
+        "migrate-sqlite", help="CSVのスコアをSQLiteに移行"
+    )
+    migrate_parser.add_argument("--csv", default="data/score.csv")
+    migrate_parser.add_argument("--db", default="data/score.db")
+    migrate_parser.set_defaults(func=migrate_sqlite)
+
+    compact_parser = subparsers.add_parser(
+        "compact", help="CSVのスコアをバイナリのスナップショットにまとめる"
+    )
+    compact_parser.add_argument("--csv", default="data/score.csv")
+    compact_parser.add_argument("--snapshot-dir", default="data/snapshot")
+    compact_parser.add_argument(
+        "--interval",
+        type=float,
+        default=0,
+        help="指定した秒数ごとに繰り返す（省略時は1回だけ）",
+    )
+    compact_parser.set_defaults(func=compact)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
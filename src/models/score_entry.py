@@ -1,10 +1,13 @@
 from dataclasses import dataclass
-from typing import Literal, Optional
+from typing import List, Literal, Optional
 
 CategoryType = Literal["社内", "社外"]
+CATEGORIES: List[CategoryType] = ["社内", "社外"]
+# ゲームの指定がない場合のゲーム（以前からのスコアはこのゲームのもの）
+DEFAULT_GAME = "ジャマイカ"
 
 
-@dataclass
+@dataclass(slots=True)
 class ScoreEntry:
     adjective: str
     animal: str
@@ -12,6 +15,8 @@ class ScoreEntry:
     score: int
     unit: Optional[str] = None
     age: Optional[str] = None
+    # スコアを記録したゲーム（保存先はゲームごとに分かれる）
+    game: str = DEFAULT_GAME
 
     @property
     def is_internal(self) -> bool:
@@ -0,0 +1,264 @@
+import math
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from .score_entry import CATEGORIES, DEFAULT_GAME, ScoreEntry
+
+# 辞書符号化する文字列の列
+STRING_COLUMNS = ("adjective", "animal", "category", "unit", "age")
+
+
+class ScoreTable:
+    """スコアを列ごとに保持するテーブル
+
+    スコアはNumPyの整数配列、文字列の列は値ごとの小さな整数コード（Noneは-1）と
+    コードから値を引く辞書で保持する。行としてはScoreEntryを返すシーケンスとして振る舞う。
+    追加はロックを取った1つのスレッドから行い、読み取り側はsnapshot()を使う。
+    1つのテーブルは1つのゲームのスコアだけを持ち、ゲームは列ではなくgameに保持する。
+    """
+
+    INITIAL_CAPACITY = 1024
+
+    def __init__(self, capacity: int = INITIAL_CAPACITY, game: str = DEFAULT_GAME):
+        capacity = max(capacity, 1)
+        self.game = game
+        # snapshot()で作ったビューと元のテーブルで共有する識別子
+        self._source = object()
+        self._size = 0
+        self._scores = np.zeros(capacity, dtype=np.int64)
+        self._codes = {
+            name: np.full(capacity, -1, dtype=np.int32) for name in STRING_COLUMNS
+        }
+        self._values: Dict[str, List[str]] = {name: [] for name in STRING_COLUMNS}
+        self._lookup: Dict[str, Dict[str, int]] = {name: {} for name in STRING_COLUMNS}
+        for category in CATEGORIES:
+            self._encode("category", category)
+
+    @classmethod
+    def from_entries(
+        cls, entries: Iterable[ScoreEntry], game: str = DEFAULT_GAME
+    ) -> "ScoreTable":
+        entries = list(entries)
+        table = cls(len(entries), game)
+        table.extend(entries)
+        return table
+
+    @classmethod
+    def as_table(cls, scores: Iterable[ScoreEntry]) -> "ScoreTable":
+        """ScoreTableならそのまま、それ以外はScoreTableに変換して返す"""
+        if isinstance(scores, ScoreTable):
+            return scores
+        scores = list(scores)
+        return cls.from_entries(scores, scores[0].game if scores else DEFAULT_GAME)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, game: str = DEFAULT_GAME) -> "ScoreTable":
+        """adjective/animal/category/score/unit/ageの列を持つDataFrameから作成"""
+        table = cls(len(df), game)
+        n = len(df)
+        table._scores[:n] = df["score"].to_numpy(dtype=np.int64)
+        for name in STRING_COLUMNS:
+            column = df[name].astype("category")
+            # DataFrameのカテゴリのコードを、テーブルの辞書のコードに置き換える
+            mapping = np.array(
+                [table._encode(name, value) for value in column.cat.categories] + [-1],
+                dtype=np.int32,
+            )
+            table._codes[name][:n] = mapping[column.cat.codes.to_numpy()]
+        table._size = n
+        return table
+
+    @classmethod
+    def from_arrays(
+        cls,
+        scores: np.ndarray,
+        codes: Dict[str, np.ndarray],
+        values: Dict[str, List[str]],
+        game: str = DEFAULT_GAME,
+    ) -> "ScoreTable":
+        """列の配列と辞書から作成
+
+        配列はコピーせずにそのまま使う（読み取り専用のメモリマップも可）。
+        追加する場合は_reserve()で新しい配列に移してから書き込む。
+        """
+        table = cls.__new__(cls)
+        table.game = game
+        table._source = object()
+        table._size = len(scores)
+        table._scores = scores
+        table._codes = {name: codes[name] for name in STRING_COLUMNS}
+        table._values = {name: list(values[name]) for name in STRING_COLUMNS}
+        table._lookup = {
+            name: {value: code for code, value in enumerate(table._values[name])}
+            for name in STRING_COLUMNS
+        }
+        for category in CATEGORIES:
+            table._encode("category", category)
+        return table
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, key: Union[int, slice]) -> Union[ScoreEntry, "ScoreTable"]:
+        if isinstance(key, slice):
+            return self.take(np.arange(self._size)[key])
+        if key < 0:
+            key += self._size
+        if not 0 <= key < self._size:
+            raise IndexError("ScoreTable index out of range")
+        return ScoreEntry(
+            adjective=self._value("adjective", key),
+            animal=self._value("animal", key),
+            category=self._value("category", key),
+            score=int(self._scores[key]),
+            unit=self._value("unit", key),
+            age=self._value("age", key),
+            game=self.game,
+        )
+
+    def __iter__(self) -> Iterator[ScoreEntry]:
+        for i in range(self._size):
+            yield self[i]
+
+    @property
+    def scores(self) -> np.ndarray:
+        """スコアの配列（読み取り専用のビュー）"""
+        return self._scores[: self._size]
+
+    @property
+    def is_internal(self) -> np.ndarray:
+        return self.codes("category") == self._lookup["category"]["社内"]
+
+    @property
+    def nbytes(self) -> int:
+        """列の配列が確保しているメモリ量"""
+        return self._scores.nbytes + sum(codes.nbytes for codes in self._codes.values())
+
+    def codes(self, name: str) -> np.ndarray:
+        """列のコードの配列（読み取り専用のビュー、Noneは-1）"""
+        return self._codes[name][: self._size]
+
+    def values(self, name: str) -> List[str]:
+        """コードから値を引く辞書（コードの順）"""
+        return self._values[name]
+
+    def code_of(self, name: str, value: Optional[str]) -> int:
+        """値のコード（存在しない値やNoneは-1）"""
+        return self._lookup[name].get(value, -1)
+
+    def decode(self, name: str, default: Optional[str] = None) -> np.ndarray:
+        """列を値のobject配列に戻す（値がない行はdefault）"""
+        lookup = np.array(self._values[name] + [default], dtype=object)
+        return lookup[self.codes(name)]
+
+    def nicknames(self) -> np.ndarray:
+        return self.decode("adjective") + self.decode("animal")
+
+    def append(self, entry: ScoreEntry) -> None:
+        self.extend([entry])
+
+    def extend(self, entries: Iterable[ScoreEntry]) -> None:
+        entries = list(entries)
+        if not entries:
+            return
+        size = self._size
+        self._reserve(size + len(entries))
+        for i, entry in enumerate(entries, start=size):
+            self._scores[i] = entry.score
+            self._codes["adjective"][i] = self._encode("adjective", entry.adjective)
+            self._codes["animal"][i] = self._encode("animal", entry.animal)
+            self._codes["category"][i] = self._encode("category", entry.category)
+            self._codes["unit"][i] = self._encode("unit", entry.unit)
+            self._codes["age"][i] = self._encode("age", entry.age)
+        # 値を書き込んでから件数を進めるので、読み取り側は途中の行を見ない
+        self._size = size + len(entries)
+
+    def snapshot(self) -> "ScoreTable":
+        """現在の行数で固定したビュー（配列と辞書は共有し、コピーしない）"""
+        size = self._size
+        view = ScoreTable.__new__(ScoreTable)
+        view.game = self.game
+        view._source = self._source
+        view._size = size
+        view._scores = self._scores[:size]
+        view._codes = {name: codes[:size] for name, codes in self._codes.items()}
+        view._values = self._values
+        view._lookup = self._lookup
+        return view
+
+    def shares_rows_with(self, other: "ScoreTable") -> bool:
+        """同じテーブル（またはそのsnapshot）で、先頭からの行を共有しているか"""
+        return self._source is other._source
+
+    def find(self, entry: ScoreEntry) -> np.ndarray:
+        """ニックネームとスコアが一致する行のマスク"""
+        return (
+            (self.codes("adjective") == self.code_of("adjective", entry.adjective))
+            & (self.codes("animal") == self.code_of("animal", entry.animal))
+            & (self.scores == entry.score)
+        )
+
+    def take(self, indices: np.ndarray) -> "ScoreTable":
+        """指定した行だけを持つテーブル（辞書は共有する）"""
+        indices = np.asarray(indices, dtype=np.int64)
+        table = ScoreTable.__new__(ScoreTable)
+        table.game = self.game
+        table._source = object()
+        table._size = len(indices)
+        table._scores = self.scores[indices]
+        table._codes = {name: self.codes(name)[indices] for name in STRING_COLUMNS}
+        table._values = self._values
+        table._lookup = self._lookup
+        return table
+
+    def select(self, mask: np.ndarray) -> "ScoreTable":
+        """マスクがTrueの行だけを持つテーブル"""
+        return self.take(np.flatnonzero(mask))
+
+    def to_frame(self) -> pd.DataFrame:
+        """カテゴリ型の列を持つDataFrameに変換"""
+        frame = {
+            name: pd.Categorical.from_codes(
+                self.codes(name), categories=self._values[name]
+            )
+            for name in STRING_COLUMNS
+        }
+        frame["score"] = self.scores
+        return pd.DataFrame(frame)[
+            ["adjective", "animal", "category", "score", "unit", "age"]
+        ]
+
+    def _value(self, name: str, i: int) -> Optional[str]:
+        code = self._codes[name][i]
+        return self._values[name][code] if code >= 0 else None
+
+    def _encode(self, name: str, value: Optional[str]) -> int:
+        if (
+            value is None
+            or value == ""
+            or (isinstance(value, float) and math.isnan(value))
+        ):
+            return -1
+        lookup = self._lookup[name]
+        code = lookup.get(value)
+        if code is None:
+            code = len(self._values[name])
+            self._values[name].append(value)
+            lookup[value] = code
+        return code
+
+    def _reserve(self, capacity: int) -> None:
+        """容量が足りなければ倍々で確保し直す（古い配列はビューのために残す）"""
+        if capacity <= len(self._scores):
+            return
+        new_capacity = max(capacity, len(self._scores) * 2)
+        scores = np.zeros(new_capacity, dtype=np.int64)
+        scores[: self._size] = self._scores[: self._size]
+        codes = {}
+        for name, old in self._codes.items():
+            codes[name] = np.full(new_capacity, -1, dtype=np.int32)
+            codes[name][: self._size] = old[: self._size]
+        self._scores = scores
+        self._codes = codes
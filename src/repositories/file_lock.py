@@ -0,0 +1,95 @@
+import errno
+import os
+import threading
+from pathlib import Path
+from typing import Optional, TypeVar, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+_FileLockT = TypeVar("_FileLockT", bound="FileLock")
+
+
+class FileLock:
+    """プロセス間で共有されるアドバイザリロック
+
+    データファイルとは別のロックファイルを使うため、データファイルが
+    書き換え（置き換え）られてもロックの対象は変わらない。
+    同じインスタンスを複数のスレッドで共有した場合はスレッド間でも排他する
+    （同じスレッドからの再取得には対応しない）。
+    """
+
+    def __init__(self, lock_path: Union[str, Path]):
+        self.lock_path = Path(lock_path)
+        # 保持中のファイル記述子を、他のスレッドの取得・解放から守る
+        self._thread_lock = threading.Lock()
+        self._fd = None
+
+    def acquire(self, blocking: bool = True) -> bool:
+        """ロックを取得する（blocking=Falseなら待たず、取得できなければFalseを返す）"""
+        if not self._thread_lock.acquire(blocking):
+            return False
+        try:
+            fd = self._lock_file(blocking)
+        except BaseException:
+            self._thread_lock.release()
+            raise
+        if fd is None:
+            self._thread_lock.release()
+            return False
+        self._fd = fd
+        return True
+
+    def release(self) -> None:
+        if self._fd is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+            self._thread_lock.release()
+
+    def _lock_file(self, blocking: bool) -> Optional[int]:
+        """ロックファイルを開いてロックし、ファイル記述子を返す（取得できなければNone）"""
+        self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+                fcntl.flock(fd, flags)
+            elif blocking:
+                # LK_LOCKは約10秒でOSErrorになるため、取得できるまで繰り返す
+                while True:
+                    try:
+                        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError as e:
+                        if e.errno != errno.EDEADLK:
+                            raise
+            else:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        except OSError:
+            os.close(fd)
+            if blocking:
+                raise
+            return None
+        except BaseException:
+            os.close(fd)
+            raise
+        return fd
+
+    def __enter__(self: _FileLockT) -> _FileLockT:
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.release()
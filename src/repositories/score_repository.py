@@ -1,75 +1,534 @@
+import csv
+import io
+import os
+import re
+import warnings
 from abc import ABC, abstractmethod
+from dataclasses import dataclass
 from pathlib import Path
-from typing import List
+from typing import Callable, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 
-from ..models.score_entry import ScoreEntry
+from ..models.score_entry import CATEGORIES, DEFAULT_GAME, ScoreEntry
+from ..models.score_table import ScoreTable
+from .file_lock import FileLock
+
+SCORE_COLUMNS = ["adjective", "animal", "score", "is_internal", "unit", "age"]
+
+# 読み込み時の列の型（scoreは不正値を検出するため、カテゴリとして読んでから変換する）
+_CSV_DTYPES = {
+    "adjective": "category",
+    "animal": "category",
+    "score": "category",
+    "is_internal": "category",
+    "unit": "category",
+    "age": "category",
+}
+_BAD_LINE_PATTERN = re.compile(r"Skipping line (\d+): (.+)")
+# CSVの読み書きで発生しうるエラー（pandasの解析エラーや文字コードのエラーはValueError）
+_CSV_ERRORS = (OSError, csv.Error, ValueError)
+
+
+class DuplicateNicknameError(Exception):
+    """既に使われているニックネームでスコアを保存しようとした"""
+
+    def __init__(self, adjective: str, animal: str):
+        super().__init__(f"ニックネーム「{adjective}{animal}」は既に使われています")
+        self.adjective = adjective
+        self.animal = animal
+
+
+class ScoreSaveError(Exception):
+    """スコアを保存できなかった（呼び出し元は登録に失敗したものとして扱う）"""
+
+
+@dataclass
+class MalformedRow:
+    line: int
+    reason: str
+
+
+@dataclass
+class ScoreRefresh:
+    """refresh_scoresの結果
+
+    reset: Trueならentriesは全件（読み直し）、Falseなら前回以降の追加分
+    """
+
+    entries: List[ScoreEntry]
+    reset: bool
+
+
+@dataclass
+class _ReadPosition:
+    """前回読み込んだ位置とファイルの状態"""
+
+    offset: int
+    mtime_ns: int
+    file_id: Tuple[int, int]
+    line_count: int
+    fingerprint: bytes
+    header: bytes
 
 
 class ScoreRepositoryInterface(ABC):
+    # このリポジトリが保存するゲーム（ゲームごとに別のリポジトリを使う）
+    game: str = DEFAULT_GAME
+
     @abstractmethod
     def load_scores(self) -> List[ScoreEntry]:
         pass
 
     @abstractmethod
     def save_score(self, entry: ScoreEntry) -> None:
+        """スコアを保存する（保存できなかった場合はScoreSaveError）"""
         pass
 
+    def save_scores(self, entries: List[ScoreEntry]) -> bool:
+        """スコアをまとめて保存し、すべて保存できたかを返す（既定では1件ずつ保存）"""
+        try:
+            for entry in entries:
+                self.save_score(entry)
+        except ScoreSaveError:
+            return False
+        return True
+
+    def save_unique_score(
+        self, entry: ScoreEntry, is_taken: Callable[[str, str], bool]
+    ) -> None:
+        """ニックネームが未使用の場合だけ保存する（使用済みならDuplicateNicknameError）
+
+        is_takenは呼び出し元が読み込み済みのスコアについての判定。既定ではこの判定だけで
+        保存するため、同じプロセス内でしか重複を防げない。
+        """
+        if is_taken(entry.adjective, entry.animal):
+            raise DuplicateNicknameError(entry.adjective, entry.animal)
+        self.save_score(entry)
+
+    def load_table(self) -> ScoreTable:
+        """スコアを列形式のテーブルとして読み込む"""
+        return ScoreTable.from_entries(self.load_scores(), self.game)
+
+    def refresh_scores(self) -> ScoreRefresh:
+        """他プロセスが書き込んだスコアを取り込む（既定では全件を読み直す）"""
+        return ScoreRefresh(self.load_scores(), reset=True)
+
 
 class CSVScoreRepository(ScoreRepositoryInterface):
-    def __init__(self, file_path: str = "data/score.csv"):
+    """CSVファイルにスコアを追記保存するリポジトリ
+
+    fsync_every: 何件の書き込みごとにfsyncするか（1なら毎回、0ならOSに任せる）
+    """
+
+    # 書き換えを検出するため、前回読み込んだ末尾のバイト列をこの長さだけ保持する
+    FINGERPRINT_SIZE = 64
+
+    def __init__(
+        self,
+        file_path: str = "data/score.csv",
+        fsync_every: int = 1,
+        game: str = DEFAULT_GAME,
+    ):
         self.file_path = Path(file_path)
+        self.game = game
+        self.lock = FileLock(self.file_path.with_name(f"{self.file_path.name}.lock"))
+        self.fsync_every = fsync_every
+        self.malformed_rows: List[MalformedRow] = []
+        self._unsynced_writes = 0
+        self._position: Optional[_ReadPosition] = None
+        # 前回の読み込み以降に自分で追記した範囲（差分読み込みで読み飛ばす）
+        self._own_ranges: List[Tuple[int, int]] = []
 
     def load_scores(self) -> List[ScoreEntry]:
+        return _frame_to_entries(self.load_frame(), self.game)
+
+    def load_table(self) -> ScoreTable:
+        return ScoreTable.from_frame(self.load_frame(), self.game)
+
+    def load_frame(self) -> pd.DataFrame:
+        """スコアを型付きのDataFrameとして読み込む（ScoreEntryは生成しない）
+
+        不正な行は読み飛ばし、行番号とともにmalformed_rowsに記録する。
+        """
+        self.malformed_rows = []
+        self._position = None
+        self._own_ranges = []
+
         try:
-            df = pd.read_csv(self.file_path)
-            return [
-                ScoreEntry(
-                    adjective=row["adjective"],
-                    animal=row["animal"],
-                    category="社内"
-                    if str(row["is_internal"]).strip().lower() == "true"
-                    else "社外",
-                    score=row["score"],
-                    unit=row.get("unit")
-                    if "unit" in df.columns and pd.notna(row.get("unit"))
-                    else None,
-                    age=row.get("age")
-                    if "age" in df.columns and pd.notna(row.get("age"))
-                    else None,
-                )
-                for _, row in df.iterrows()
-            ]
-        except Exception as e:
+            with self.lock:
+                if not self.file_path.exists():
+                    self._position = _ReadPosition(0, 0, (0, 0), 0, b"", b"")
+                    return _empty_frame()
+                with open(self.file_path, "rb") as f:
+                    data = f.read()
+                    stat = os.fstat(f.fileno())
+            df, self.malformed_rows = _parse_score_csv(data)
+        except _CSV_ERRORS as e:
+            print(f"CSV読み込みエラー: {e}")
+            return _empty_frame()
+
+        self._position = _ReadPosition(
+            offset=len(data),
+            mtime_ns=stat.st_mtime_ns,
+            file_id=(stat.st_dev, stat.st_ino),
+            line_count=data.count(b"\n"),
+            fingerprint=data[-self.FINGERPRINT_SIZE :],
+            header=data[: data.find(b"\n") + 1],
+        )
+        self._report_malformed(self.malformed_rows)
+        return df
+
+    def refresh_scores(self) -> ScoreRefresh:
+        df, reset = self.refresh_frame()
+        return ScoreRefresh(_frame_to_entries(df, self.game), reset=reset)
+
+    def refresh_frame(self) -> Tuple[pd.DataFrame, bool]:
+        """前回の読み込み以降に追記された行だけを読み込む
+
+        ファイルの切り詰めや書き換えを検出した場合は全件を読み直し、
+        2つ目の戻り値をTrueにする。
+        """
+        position = self._position
+        if position is None:
+            return self._reload()
+
+        try:
+            stat = self.file_path.stat()
+        except FileNotFoundError:
+            if position.offset == 0:
+                return _empty_frame(), False
+            return self._reload()
+
+        if stat.st_size == position.offset and stat.st_mtime_ns == position.mtime_ns:
+            return _empty_frame(), False
+        # 別ファイルへの置き換えや切り詰めがあれば全件を読み直す
+        replaced = (
+            position.offset > 0 and (stat.st_dev, stat.st_ino) != position.file_id
+        )
+        if replaced or stat.st_size <= position.offset:
+            return self._reload()
+
+        try:
+            with self.lock:
+                frames = self._read_tail(position)
+        except _CSV_ERRORS as e:
+            # 読み込み位置を進められないため、差分ではなく全件を読み直す
             print(f"CSV読み込みエラー: {e}")
-            return []
+            return self._reload()
+        if frames is None:
+            return self._reload()
+        if not frames:
+            return _empty_frame(), False
+        return (frames[0] if len(frames) == 1 else pd.concat(frames)), False
+
+    def _reload(self) -> Tuple[pd.DataFrame, bool]:
+        """全件を読み直す
+
+        読み直しに失敗した場合は、読み込み済みのスコアをそのまま使うよう変更なしを返す。
+        """
+        df = self.load_frame()
+        if self._position is None:
+            return _empty_frame(), False
+        return df, True
 
     def save_score(self, entry: ScoreEntry) -> None:
+        """追記する（保存に失敗した場合はScoreSaveErrorを送出する）"""
         try:
-            df = (
-                pd.read_csv(self.file_path)
-                if self.file_path.exists()
-                else pd.DataFrame(
-                    columns=[
-                        "adjective",
-                        "animal",
-                        "score",
-                        "is_internal",
-                        "unit",
-                        "age",
+            with self.lock:
+                self._append_rows([entry])
+        except _CSV_ERRORS as e:
+            print(f"CSV保存エラー: {e}")
+            raise ScoreSaveError(str(e)) from e
+
+    def save_scores(self, entries: List[ScoreEntry]) -> bool:
+        """ロックを1回だけ取って、まとめて追記する"""
+        try:
+            with self.lock:
+                self._append_rows(entries)
+        except _CSV_ERRORS as e:
+            print(f"CSV保存エラー: {e}")
+            return False
+        return True
+
+    def save_unique_score(
+        self, entry: ScoreEntry, is_taken: Callable[[str, str], bool]
+    ) -> None:
+        """ファイルロックの中で重複を確認してから追記する
+
+        読み込み済みの範囲はis_takenでO(1)に判定し、他プロセスが追記したまだ読んでいない
+        範囲だけを走査するため、プロセスをまたいでも同じニックネームは1回しか保存されない。
+        保存に失敗した場合はScoreSaveErrorを送出する。
+        """
+        try:
+            with self.lock:
+                if is_taken(entry.adjective, entry.animal) or self._unread_has_nickname(
+                    entry.adjective, entry.animal
+                ):
+                    raise DuplicateNicknameError(entry.adjective, entry.animal)
+                self._append_rows([entry])
+        except _CSV_ERRORS as e:
+            print(f"CSV保存エラー: {e}")
+            raise ScoreSaveError(str(e)) from e
+
+    def sync(self) -> None:
+        """未fsyncの書き込みをディスクに反映"""
+        if not self._unsynced_writes or not self.file_path.exists():
+            return
+        with self.lock, open(self.file_path, "rb+") as f:
+            os.fsync(f.fileno())
+            self._unsynced_writes = 0
+
+    def _append_rows(self, entries: List[ScoreEntry]) -> None:
+        """ロック取得済みの前提で、エントリをCSVの末尾に追記"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+
+        self.file_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.file_path, "ab+") as f:
+            size = f.seek(0, os.SEEK_END)
+            if size == 0:
+                # 初回書き込み時はヘッダーを出力
+                writer.writerow(SCORE_COLUMNS)
+            else:
+                # 最終行が改行で終わっていない場合は補完
+                f.seek(size - 1)
+                if f.read(1) != b"\n":
+                    buffer.write("\n")
+
+            for entry in entries:
+                writer.writerow(
+                    [
+                        entry.adjective,
+                        entry.animal,
+                        entry.score,
+                        str(entry.is_internal).lower(),
+                        entry.unit if entry.unit else "",
+                        entry.age if entry.age else "",
                     ]
                 )
-            )
-            new_row = {
-                "adjective": entry.adjective,
-                "animal": entry.animal,
-                "is_internal": str(entry.is_internal).lower(),
-                "score": entry.score,
-                "unit": entry.unit if entry.unit else "",
-                "age": entry.age if entry.age else "",
-            }
-            df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-            df.to_csv(self.file_path, index=False)
-        except Exception as e:
-            print(f"CSV保存エラー: {e}")
+
+            data = buffer.getvalue().encode("utf-8")
+            f.write(data)
+            f.flush()
+
+            self._unsynced_writes += len(entries)
+            if self.fsync_every and self._unsynced_writes >= self.fsync_every:
+                os.fsync(f.fileno())
+                self._unsynced_writes = 0
+
+            self._track_own_write(size, data, os.fstat(f.fileno()))
+
+    def _unread_has_nickname(self, adjective: str, animal: str) -> bool:
+        """ロック取得済みの前提で、まだ読み込んでいない範囲にニックネームがあるか"""
+        try:
+            stat = self.file_path.stat()
+        except FileNotFoundError:
+            return False
+        position = self._position
+        offset = 0
+        if (
+            position is not None
+            and position.offset <= stat.st_size
+            and (position.offset == 0 or (stat.st_dev, stat.st_ino) == position.file_id)
+        ):
+            offset = position.offset
+        if offset == stat.st_size:
+            return False
+
+        with open(self.file_path, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+        reader = csv.reader(io.StringIO(data.decode("utf-8", errors="replace")))
+        return any(
+            len(row) >= 2 and row[0] == adjective and row[1] == animal for row in reader
+        )
+
+    def _track_own_write(self, start: int, data: bytes, stat: os.stat_result) -> None:
+        """自分の追記を読み込み位置に反映し、差分読み込みで重複しないようにする"""
+        position = self._position
+        if position is None:
+            return
+        if start != position.offset or self._own_ranges:
+            # 間に他プロセスの追記がある場合は、次の差分読み込みで読み飛ばす
+            self._own_ranges.append((start, start + len(data)))
+            return
+
+        self._position = _ReadPosition(
+            offset=start + len(data),
+            mtime_ns=stat.st_mtime_ns,
+            file_id=(stat.st_dev, stat.st_ino),
+            line_count=position.line_count + data.count(b"\n"),
+            fingerprint=(position.fingerprint + data)[-self.FINGERPRINT_SIZE :],
+            header=position.header or data[: data.find(b"\n") + 1],
+        )
+
+    def _read_tail(self, position: _ReadPosition) -> Optional[List[pd.DataFrame]]:
+        """ロック取得済みの前提で、追記分を読み込む（書き換えを検出したらNone）"""
+        base = position.offset - len(position.fingerprint)
+        with open(self.file_path, "rb") as f:
+            f.seek(base)
+            data = f.read()
+            stat = os.fstat(f.fileno())
+        if not data.startswith(position.fingerprint):
+            return None
+
+        header = position.header
+        cursor = position.offset
+        line_count = position.line_count
+        if not header:
+            # 空のファイルから読み始めた場合（base == 0）は先頭行をヘッダーとして扱う
+            newline = data.find(b"\n")
+            if newline < 0:
+                return []
+            header = data[: newline + 1]
+            cursor += len(header)
+            line_count += 1
+
+        # 自分の追記範囲を除いた、他プロセスによる追記部分を切り出す
+        pieces = []
+        for start, end in self._own_ranges + [(base + len(data),) * 2]:
+            pieces.append((data[cursor - base : start - base], True))
+            pieces.append((data[start - base : end - base], False))
+            cursor = end
+
+        frames = []
+        malformed = []
+        for piece, foreign in pieces:
+            if foreign and piece.strip():
+                first_line = line_count + 1
+                if piece.startswith(b"\n"):
+                    # 前回の最終行が改行で終わっていなかった場合の補完分は読み飛ばす
+                    first_line += 1
+                    piece = piece[1:]
+                    line_count += 1
+                df, rows = _parse_score_csv(header + piece, first_line)
+                frames.append(df)
+                malformed.extend(rows)
+            line_count += piece.count(b"\n")
+
+        self._position = _ReadPosition(
+            offset=base + len(data),
+            mtime_ns=stat.st_mtime_ns,
+            file_id=(stat.st_dev, stat.st_ino),
+            line_count=line_count,
+            fingerprint=data[-self.FINGERPRINT_SIZE :],
+            header=header,
+        )
+        self._own_ranges = []
+        self.malformed_rows.extend(malformed)
+        self._report_malformed(malformed)
+        return frames
+
+    def _report_malformed(self, rows: List[MalformedRow]) -> None:
+        for row in rows:
+            print(f"CSV読み込みエラー: {row.line}行目: {row.reason}")
+
+
+def _empty_frame() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "adjective": pd.Categorical([]),
+            "animal": pd.Categorical([]),
+            "category": pd.Categorical([], categories=CATEGORIES),
+            "score": pd.Series([], dtype="int64"),
+            "unit": pd.Categorical([]),
+            "age": pd.Categorical([]),
+        }
+    )
+
+
+def _frame_to_entries(df: pd.DataFrame, game: str = DEFAULT_GAME) -> List[ScoreEntry]:
+    return [
+        ScoreEntry(adjective, animal, category, score, unit, age, game)
+        for adjective, animal, category, score, unit, age in zip(
+            _to_list(df["adjective"]),
+            _to_list(df["animal"]),
+            _to_list(df["category"]),
+            df["score"].tolist(),
+            _to_list(df["unit"]),
+            _to_list(df["age"]),
+        )
+    ]
+
+
+def _to_list(column: pd.Series) -> list:
+    """欠損値をNoneにしたPythonのリストに変換"""
+    return column.astype(object).where(column.notna(), None).tolist()
+
+
+def _parse_score_csv(
+    data: bytes, first_line: int = 2
+) -> Tuple[pd.DataFrame, List[MalformedRow]]:
+    """CSVのバイト列を型付きのDataFrameに変換し、不正な行を行番号付きで返す
+
+    first_line: ヘッダーの次の行がファイル上で何行目にあたるか
+    """
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always", pd.errors.ParserWarning)
+        raw = pd.read_csv(
+            io.BytesIO(data),
+            dtype=_CSV_DTYPES,
+            on_bad_lines="warn",
+            skip_blank_lines=False,
+        )
+
+    malformed = []
+    for warning in caught:
+        for match in _BAD_LINE_PATTERN.finditer(str(warning.message)):
+            line = int(match.group(1)) - 2 + first_line
+            malformed.append(MalformedRow(line, match.group(2)))
+
+    missing = {"adjective", "animal", "score", "is_internal"} - set(raw.columns)
+    if missing:
+        raise ValueError(f"必須の列がありません: {', '.join(sorted(missing))}")
+
+    # 列数不正で読み飛ばされた行を除いて、各行のファイル上の行番号を復元
+    skipped = {row.line for row in malformed}
+    line_numbers = np.arange(first_line, first_line + len(raw) + len(skipped))
+    line_numbers = line_numbers[~np.isin(line_numbers, list(skipped))]
+
+    blank = raw.isna().all(axis=1).to_numpy()
+    # 数値変換は重複を除いたカテゴリに対してのみ行う
+    score_codes = raw["score"].cat.codes.to_numpy()
+    score_values = pd.to_numeric(
+        raw["score"].cat.categories.astype(str), errors="coerce"
+    ).to_numpy(dtype="float64")
+    scores = np.where(score_codes >= 0, score_values[score_codes], np.nan)
+    invalid_score = np.isnan(scores) | (scores % 1 != 0)
+    missing_name = (raw["adjective"].isna() | raw["animal"].isna()).to_numpy()
+
+    for line, score in zip(
+        line_numbers[~blank & invalid_score], raw["score"][~blank & invalid_score]
+    ):
+        malformed.append(
+            MalformedRow(int(line), f"スコアが整数ではありません: {score}")
+        )
+    for line in line_numbers[~blank & ~invalid_score & missing_name]:
+        malformed.append(MalformedRow(int(line), "ニックネームがありません"))
+    malformed.sort(key=lambda row: row.line)
+
+    valid = ~(blank | invalid_score | missing_name)
+    raw = raw[valid].reset_index(drop=True)
+
+    # is_internalはカテゴリ単位で判定し、コードの対応付けで社内/社外に変換
+    flags = raw["is_internal"].cat
+    true_codes = np.flatnonzero(
+        flags.categories.astype(str).str.strip().str.lower() == "true"
+    )
+    is_internal = np.isin(flags.codes.to_numpy(), true_codes)
+
+    df = pd.DataFrame(
+        {
+            "adjective": raw["adjective"].cat.remove_unused_categories(),
+            "animal": raw["animal"].cat.remove_unused_categories(),
+            "category": pd.Categorical.from_codes(
+                np.where(is_internal, 0, 1), categories=CATEGORIES
+            ),
+            "score": scores[valid].astype("int64"),
+            "unit": raw["unit"] if "unit" in raw else pd.Categorical([None] * len(raw)),
+            "age": raw["age"] if "age" in raw else pd.Categorical([None] * len(raw)),
+        }
+    )
+    return df, malformed
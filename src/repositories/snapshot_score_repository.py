@@ -0,0 +1,179 @@
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from ..models.score_entry import DEFAULT_GAME, ScoreEntry
+from ..models.score_table import STRING_COLUMNS, ScoreTable
+from ..services.score_statistics import StatisticsAccumulator
+from .score_repository import CSVScoreRepository, _frame_to_entries, _ReadPosition
+
+
+class SnapshotScoreRepository(CSVScoreRepository):
+    """CSVを追記ログとして使い、バイナリのスナップショットから起動するリポジトリ
+
+    compact()でスコアを列ごとのNumPy配列（.npy、文字列は辞書符号化）に書き出し、
+    CSVのどこまでを含むかをmeta.jsonに記録する。起動時は配列をメモリマップで開き、
+    CSVのそれ以降の追記分だけを読み込むため、起動時間は履歴全体ではなく追記分の量で決まる。
+    CSVが書き換えられていた場合（スナップショットの範囲の末尾のバイト列か、
+    追記がないのに更新日時が変わっている場合）やスナップショットがない場合は、CSVを全件読み込む。
+    スナップショットには集計値（StatisticsAccumulator）も保存し、再起動したプロセスが
+    全件を走査せずに続きから集計できるようにする。
+    """
+
+    SNAPSHOT_FORMAT = 1
+    META_FILE = "meta.json"
+
+    def __init__(
+        self,
+        file_path: str = "data/score.csv",
+        snapshot_dir: str = "data/snapshot",
+        fsync_every: int = 1,
+        game: str = DEFAULT_GAME,
+    ):
+        super().__init__(file_path, fsync_every, game)
+        self.snapshot_dir = Path(snapshot_dir)
+        # スナップショットに含まれる行の集計値
+        # （直前のload_tableがスナップショットから読み込んだ場合のみ）
+        self.snapshot_statistics: Optional[StatisticsAccumulator] = None
+
+    def load_scores(self) -> List[ScoreEntry]:
+        return list(self.load_table())
+
+    def load_table(self) -> ScoreTable:
+        self.snapshot_statistics = None
+        snapshot = self._read_snapshot()
+        if snapshot is None:
+            return super().load_table()
+        table, position, statistics = snapshot
+
+        try:
+            stat = self.file_path.stat()
+        except FileNotFoundError:
+            return super().load_table()
+        # 追記がないのに更新日時が変わっていれば、同じサイズのまま書き換えられている
+        rewritten = (
+            stat.st_size == position.offset and stat.st_mtime_ns != position.mtime_ns
+        )
+        if (
+            stat.st_size < position.offset
+            or rewritten
+            or not self._matches_fingerprint(position)
+        ):
+            # スナップショットの後でCSVが切り詰められたか書き換えられた
+            return super().load_table()
+
+        # スナップショットに含まれる位置から差分読み込みする
+        self.malformed_rows = []
+        self._own_ranges = []
+        self._position = _ReadPosition(
+            offset=position.offset,
+            # 追記がなければ、差分読み込みで「変更なし」と判定されるようにする
+            mtime_ns=stat.st_mtime_ns if stat.st_size == position.offset else 0,
+            file_id=(stat.st_dev, stat.st_ino),
+            line_count=position.line_count,
+            fingerprint=position.fingerprint,
+            header=position.header,
+        )
+        df, reset = self.refresh_frame()
+        if reset:
+            # スナップショットの後でCSVが書き換えられていた
+            return ScoreTable.from_frame(df, self.game)
+        if statistics is not None and statistics.count == len(table):
+            self.snapshot_statistics = statistics
+        table.extend(_frame_to_entries(df, self.game))
+        return table
+
+    def compact(self) -> int:
+        """スナップショットと追記分から新しいスナップショットを作り、含めた件数を返す"""
+        table = self.load_table()
+        position = self._position
+        if position is None:
+            return 0
+
+        # 配列は世代ごとのディレクトリに書き、meta.jsonの置き換えで切り替える
+        generation = f"arrays-{time.time_ns()}-{os.getpid()}"
+        directory = self.snapshot_dir / generation
+        directory.mkdir(parents=True)
+        np.save(directory / "score.npy", table.scores)
+        for name in STRING_COLUMNS:
+            np.save(directory / f"{name}.npy", table.codes(name))
+
+        meta = {
+            "format": self.SNAPSHOT_FORMAT,
+            "arrays": generation,
+            "rows": len(table),
+            "values": {name: table.values(name) for name in STRING_COLUMNS},
+            "offset": position.offset,
+            "line_count": position.line_count,
+            "mtime_ns": position.mtime_ns,
+            "fingerprint": position.fingerprint.hex(),
+            "header": position.header.hex(),
+            "statistics": StatisticsAccumulator.from_table(table).to_dict(),
+        }
+        meta_path = self.snapshot_dir / self.META_FILE
+        temp_path = self.snapshot_dir / f"{self.META_FILE}.{generation}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, meta_path)
+
+        # 古い世代を削除（開いているプロセスのメモリマップはPOSIXでは有効なまま）
+        for old in self.snapshot_dir.glob("arrays-*"):
+            if old.name != generation:
+                shutil.rmtree(old, ignore_errors=True)
+        return len(table)
+
+    def _matches_fingerprint(self, position: _ReadPosition) -> bool:
+        """CSVのoffset直前のバイト列が、スナップショット作成時と同じか"""
+        try:
+            with open(self.file_path, "rb") as f:
+                f.seek(position.offset - len(position.fingerprint))
+                return f.read(len(position.fingerprint)) == position.fingerprint
+        except OSError as e:
+            print(f"CSV読み込みエラー: {e}")
+            return False
+
+    def _read_snapshot(
+        self,
+    ) -> Optional[Tuple[ScoreTable, _ReadPosition, Optional[StatisticsAccumulator]]]:
+        """スナップショットをメモリマップで開く（ない・読めない場合はNone）
+
+        集計値は以前の形式のメタデータにはないため、その場合はNoneを返す。
+        """
+        meta_path = self.snapshot_dir / self.META_FILE
+        if not meta_path.exists():
+            return None
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("format") != self.SNAPSHOT_FORMAT:
+                return None
+            directory = self.snapshot_dir / meta["arrays"]
+            scores = np.load(directory / "score.npy", mmap_mode="r")
+            codes = {
+                name: np.load(directory / f"{name}.npy", mmap_mode="r")
+                for name in STRING_COLUMNS
+            }
+            table = ScoreTable.from_arrays(scores, codes, meta["values"], self.game)
+            position = _ReadPosition(
+                offset=meta["offset"],
+                # 以前の形式のメタデータにはないため0とし、追記がなければ全件を読み直す
+                mtime_ns=meta.get("mtime_ns", 0),
+                file_id=(0, 0),
+                line_count=meta["line_count"],
+                fingerprint=bytes.fromhex(meta["fingerprint"]),
+                header=bytes.fromhex(meta["header"]),
+            )
+            statistics = None
+            if meta.get("statistics") is not None:
+                statistics = StatisticsAccumulator.from_dict(meta["statistics"])
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"スナップショット読み込みエラー: {e}")
+            return None
+        return table, position, statistics
@@ -0,0 +1,346 @@
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Set, Tuple
+
+from ..models.score_entry import DEFAULT_GAME, ScoreEntry
+from ..services.score_statistics import StatisticsResult
+from .score_repository import (
+    DuplicateNicknameError,
+    ScoreRefresh,
+    ScoreRepositoryInterface,
+    ScoreSaveError,
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    adjective TEXT NOT NULL,
+    animal TEXT NOT NULL,
+    category TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    unit TEXT,
+    age TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_scores_score ON scores (score);
+CREATE INDEX IF NOT EXISTS idx_scores_category ON scores (category, score);
+CREATE INDEX IF NOT EXISTS idx_scores_unit ON scores (unit, score);
+CREATE INDEX IF NOT EXISTS idx_scores_age ON scores (age, score);
+"""
+
+# 同じニックネームは1回しか登録できない（複数のプロセスが同時に登録しても）
+_UNIQUE_NICKNAME_INDEX = (
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_scores_nickname_unique"
+    " ON scores (adjective, animal)"
+)
+# 既存のデータにニックネームの重複がある場合に代わりに使う索引
+_NICKNAME_INDEX = (
+    "CREATE INDEX IF NOT EXISTS idx_scores_nickname ON scores (adjective, animal)"
+)
+
+_COLUMNS = "adjective, animal, category, score, unit, age"
+
+
+class SQLiteScoreRepository(ScoreRepositoryInterface):
+    """SQLiteにスコアを保存するリポジトリ
+
+    WALモードで開くため、読み込みが書き込みをブロックしない。
+    フィルタリング・順位・集計はSQLで計算する（順位と集計はScoreStoreが使い、
+    他プロセスが追加してまだ取り込んでいないスコアも含めて答える）。
+    """
+
+    def __init__(
+        self,
+        db_path: str = "data/score.db",
+        timeout: float = 10.0,
+        game: str = DEFAULT_GAME,
+    ):
+        self.db_path = Path(db_path)
+        self.game = game
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._last_id = 0
+        # 前回の読み込み以降に自分で追加した行のID（差分読み込みで読み飛ばす）
+        self._own_ids: Set[int] = set()
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+            self._ensure_unique_nicknames(conn)
+
+    def _connect(self) -> sqlite3.Connection:
+        """スレッドごとの接続を取得"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=self.timeout)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def load_scores(self) -> List[ScoreEntry]:
+        try:
+            rows = (
+                self._connect()
+                .execute(f"SELECT id, {_COLUMNS} FROM scores ORDER BY id")
+                .fetchall()
+            )
+        except sqlite3.Error as e:
+            print(f"SQLite読み込みエラー: {e}")
+            return []
+
+        with self._lock:
+            self._last_id = rows[-1][0] if rows else 0
+            self._own_ids.clear()
+        return [ScoreEntry(*row[1:], game=self.game) for row in rows]
+
+    def save_score(self, entry: ScoreEntry) -> None:
+        """登録する（保存に失敗した場合はScoreSaveErrorを送出する）"""
+        if not self.save_scores([entry]):
+            raise ScoreSaveError(
+                f"ニックネーム「{entry.nickname}」を保存できませんでした"
+            )
+
+    def save_scores(self, entries: List[ScoreEntry]) -> bool:
+        """1つのトランザクションでまとめて登録
+
+        既に使われているニックネームのスコアは、一意制約のため登録せずに読み飛ばす
+        （裏で保存する場合に、1件の重複でまとめて保存できなくなるのを防ぐ）。
+        """
+        try:
+            with self._lock, self._connect() as conn:
+                for entry in entries:
+                    cursor = conn.execute(
+                        f"INSERT OR IGNORE INTO scores ({_COLUMNS})"
+                        " VALUES (?, ?, ?, ?, ?, ?)",
+                        _to_row(entry),
+                    )
+                    if cursor.rowcount:
+                        self._own_ids.add(cursor.lastrowid)
+                    else:
+                        print(
+                            f"SQLite保存エラー: ニックネーム「{entry.nickname}」は"
+                            "既に使われているため保存しませんでした"
+                        )
+        except sqlite3.Error as e:
+            print(f"SQLite保存エラー: {e}")
+            return False
+        return True
+
+    def save_unique_score(
+        self, entry: ScoreEntry, is_taken: Callable[[str, str], bool]
+    ) -> None:
+        """ニックネームが未使用の場合だけ登録する
+
+        (adjective, animal)の一意制約があるため、他プロセスと同時に登録しても
+        同じニックネームは1回しか保存されない（制約に反した場合もDuplicateNicknameError）。
+        保存に失敗した場合はScoreSaveErrorを送出する。
+        """
+        if is_taken(entry.adjective, entry.animal):
+            raise DuplicateNicknameError(entry.adjective, entry.animal)
+        try:
+            with self._lock, self._connect() as conn:
+                cursor = conn.execute(
+                    f"INSERT INTO scores ({_COLUMNS}) SELECT ?, ?, ?, ?, ?, ?"
+                    " WHERE NOT EXISTS"
+                    " (SELECT 1 FROM scores WHERE adjective = ? AND animal = ?)",
+                    _to_row(entry) + (entry.adjective, entry.animal),
+                )
+                if not cursor.rowcount:
+                    raise DuplicateNicknameError(entry.adjective, entry.animal)
+                self._own_ids.add(cursor.lastrowid)
+        except sqlite3.IntegrityError:
+            # 他のプロセスが同時に同じニックネームを登録した
+            raise DuplicateNicknameError(entry.adjective, entry.animal) from None
+        except sqlite3.Error as e:
+            print(f"SQLite保存エラー: {e}")
+            raise ScoreSaveError(str(e)) from e
+
+    def refresh_scores(self) -> ScoreRefresh:
+        """前回の読み込み以降に追加された行だけを読み込む"""
+        with self._lock:
+            try:
+                rows = (
+                    self._connect()
+                    .execute(
+                        f"SELECT id, {_COLUMNS} FROM scores WHERE id > ? ORDER BY id",
+                        (self._last_id,),
+                    )
+                    .fetchall()
+                )
+            except sqlite3.Error as e:
+                print(f"SQLite読み込みエラー: {e}")
+                return ScoreRefresh([], reset=False)
+
+            if rows:
+                self._last_id = max(self._last_id, rows[-1][0])
+            entries = [
+                ScoreEntry(*row[1:], game=self.game)
+                for row in rows
+                if row[0] not in self._own_ids
+            ]
+            self._own_ids = {i for i in self._own_ids if i > self._last_id}
+        return ScoreRefresh(entries, reset=False)
+
+    def import_scores(self, entries: Iterable[ScoreEntry]) -> int:
+        """スコアをまとめて登録し、登録した件数を返す"""
+        with self._connect() as conn:
+            cursor = conn.executemany(
+                f"INSERT INTO scores ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)",
+                (_to_row(entry) for entry in entries),
+            )
+        return cursor.rowcount
+
+    def migrate_from(self, source: ScoreRepositoryInterface) -> int:
+        """別のリポジトリからスコアを移行（テーブルが空の場合のみ）"""
+        if self.count_scores():
+            return 0
+        # 移行元にニックネームの重複があっても全件を移せるよう、一意制約は移行後に作る
+        with self._connect() as conn:
+            conn.execute("DROP INDEX IF EXISTS idx_scores_nickname_unique")
+        count = self.import_scores(source.load_scores())
+        with self._connect() as conn:
+            self._ensure_unique_nicknames(conn)
+        return count
+
+    def _ensure_unique_nicknames(self, conn: sqlite3.Connection) -> None:
+        """ニックネームの一意制約を作る（既存のデータに重複があれば通常の索引で代用）"""
+        try:
+            conn.execute(_UNIQUE_NICKNAME_INDEX)
+        except sqlite3.IntegrityError:
+            print(
+                "SQLiteエラー: ニックネームが重複したスコアがあるため、"
+                "一意制約を作成できませんでした"
+            )
+            conn.execute(_NICKNAME_INDEX)
+        else:
+            conn.execute("DROP INDEX IF EXISTS idx_scores_nickname")
+
+    def get_unique_categories(self) -> List[str]:
+        return self._distinct("category", "1")
+
+    def get_unique_units(self) -> List[str]:
+        return self._distinct(
+            "unit", "category = '社内' AND unit IS NOT NULL AND unit != ''"
+        )
+
+    def get_unique_ages(self) -> List[str]:
+        return self._distinct("age", "age IS NOT NULL AND age != ''")
+
+    def filter_scores(
+        self,
+        selected_categories: Optional[Set[str]] = None,
+        selected_units: Optional[Set[str]] = None,
+        selected_ages: Optional[Set[str]] = None,
+    ) -> List[ScoreEntry]:
+        """スコアをフィルタリング（ScoreFilterServiceと同じ条件）"""
+        where, params = _filter_clause(
+            selected_categories, selected_units, selected_ages
+        )
+        try:
+            rows = (
+                self._connect()
+                .execute(
+                    f"SELECT {_COLUMNS} FROM scores WHERE {where} ORDER BY id", params
+                )
+                .fetchall()
+            )
+        except sqlite3.Error as e:
+            print(f"SQLite読み込みエラー: {e}")
+            return []
+        return [ScoreEntry(*row, game=self.game) for row in rows]
+
+    def count_scores(
+        self,
+        selected_categories: Optional[Set[str]] = None,
+        selected_units: Optional[Set[str]] = None,
+        selected_ages: Optional[Set[str]] = None,
+    ) -> int:
+        where, params = _filter_clause(
+            selected_categories, selected_units, selected_ages
+        )
+        return (
+            self._connect()
+            .execute(f"SELECT COUNT(*) FROM scores WHERE {where}", params)
+            .fetchone()[0]
+        )
+
+    def calculate_rank(self, score: int) -> Optional[Tuple[int, int]]:
+        """同点は同順位とした順位と全体の人数を返す（読み込めない場合はNone）"""
+        try:
+            better, total = (
+                self._connect()
+                .execute(
+                    "SELECT (SELECT COUNT(*) FROM scores WHERE score > ?),"
+                    " (SELECT COUNT(*) FROM scores)",
+                    (int(score),),
+                )
+                .fetchone()
+            )
+        except sqlite3.Error as e:
+            print(f"SQLite読み込みエラー: {e}")
+            return None
+        return better + 1, total
+
+    def calculate_statistics(self) -> Optional[StatisticsResult]:
+        """件数・平均点・最高点とその最初のエントリ（空か読み込めない場合はNone）"""
+        try:
+            conn = self._connect()
+            max_score, avg_score, total_players = conn.execute(
+                "SELECT MAX(score), AVG(score), COUNT(*) FROM scores"
+            ).fetchone()
+            if not total_players:
+                return None
+            top_player = conn.execute(
+                f"SELECT {_COLUMNS} FROM scores ORDER BY score DESC, id LIMIT 1"
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"SQLite読み込みエラー: {e}")
+            return None
+        return StatisticsResult(
+            max_score=max_score,
+            avg_score=round(avg_score, 1),
+            total_players=total_players,
+            top_player=ScoreEntry(*top_player, game=self.game),
+        )
+
+    def _distinct(self, column: str, where: str) -> List[str]:
+        rows = (
+            self._connect()
+            .execute(f"SELECT DISTINCT {column} FROM scores WHERE {where}")
+            .fetchall()
+        )
+        return sorted(row[0] for row in rows)
+
+
+def _to_row(entry: ScoreEntry) -> tuple:
+    return (
+        entry.adjective,
+        entry.animal,
+        entry.category,
+        int(entry.score),
+        entry.unit if entry.unit else None,
+        entry.age if entry.age else None,
+    )
+
+
+def _filter_clause(
+    selected_categories: Optional[Set[str]],
+    selected_units: Optional[Set[str]],
+    selected_ages: Optional[Set[str]],
+) -> Tuple[str, list]:
+    conditions = ["1"]
+    params: list = []
+    if selected_categories:
+        conditions.append(f"category IN ({', '.join('?' * len(selected_categories))})")
+        params.extend(selected_categories)
+    if selected_units:
+        conditions.append(
+            f"category = '社内' AND unit IN ({', '.join('?' * len(selected_units))})"
+        )
+        params.extend(selected_units)
+    if selected_ages:
+        conditions.append(f"age IN ({', '.join('?' * len(selected_ages))})")
+        params.extend(selected_ages)
+    return " AND ".join(conditions), params
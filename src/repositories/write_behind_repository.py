@@ -0,0 +1,257 @@
+import atexit
+import json
+import os
+import threading
+import uuid
+from collections import deque
+from dataclasses import asdict
+from itertools import islice
+from pathlib import Path
+from typing import Deque, List, Optional, Tuple
+
+from ..models.score_entry import ScoreEntry
+from ..models.score_table import ScoreTable
+from .file_lock import FileLock
+from .score_repository import (
+    ScoreRefresh,
+    ScoreRepositoryInterface,
+    ScoreSaveError,
+)
+
+
+class WriteBehindScoreRepository(ScoreRepositoryInterface):
+    """保存を裏のスレッドでまとめて行うリポジトリ
+
+    save_scoreはジャーナル（ローカルのJSONLファイル）に追記してキューに積むだけで戻り、
+    裏のスレッドがbatch_size件ずつ元のリポジトリに保存する。
+    キューがmax_pending件に達したら、空きができるまでsave_scoreを待たせる。
+    保存済みの位置はジャーナルに記録し、異常終了した場合は次回起動時に未保存分を保存し直す
+    （保存とその記録の間で落ちた場合は同じスコアが2回保存されうる）。
+    読み込み系はまだ保存していないスコアを含めて返す。
+
+    同じデータを複数のプロセスが扱えるよう、ジャーナルはインスタンスごとに
+    journal_pathの後ろに識別子を付けた別ファイルにし、使っている間はロックを保持する。
+    起動時はロックが取れる（持ち主が終了した）ジャーナルだけを引き取るため、
+    他のプロセスの未保存分を消したり、同時に起動したプロセスが同じ分を二重に保存したりしない。
+    close()の後に保存されたスコアは、ジャーナルを通さずに元のリポジトリへ直接保存する。
+    """
+
+    def __init__(
+        self,
+        repository: ScoreRepositoryInterface,
+        journal_path: str = "data/score.journal",
+        max_pending: int = 1000,
+        batch_size: int = 100,
+        retry_interval: float = 1.0,
+    ):
+        self.repository = repository
+        self.journal_path = Path(journal_path)
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.retry_interval = retry_interval
+
+        # _pendingと_sequenceとジャーナルは_conditionで保護する
+        self._condition = threading.Condition()
+        self._pending: Deque[Tuple[int, ScoreEntry]] = deque()
+        self._sequence = 0
+        self._closing = False
+        # 元のリポジトリへの保存中は、読み込みで同じスコアを二重に数えないよう待たせる
+        self._write_lock = threading.Lock()
+
+        # このインスタンスのジャーナル（使っている間はロックを保持する）
+        self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+        self._journal_file = self.journal_path.with_name(
+            f"{self.journal_path.name}.{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        )
+        self._journal_lock = FileLock(_lock_path(self._journal_file))
+        self._journal_lock.acquire()
+        # 追記のたびに開き直さないよう、close()まで開いたままにする
+        self._journal = open(self._journal_file, "a", encoding="utf-8")  # noqa: SIM115
+        self._adopt_journals()
+
+        self._thread = threading.Thread(
+            target=self._run, name="score-write-behind", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.close)
+
+    @property
+    def game(self) -> str:
+        return self.repository.game
+
+    @property
+    def pending_count(self) -> int:
+        """まだ保存していない件数"""
+        with self._condition:
+            return len(self._pending)
+
+    def load_scores(self) -> List[ScoreEntry]:
+        with self._write_lock:
+            return self.repository.load_scores() + self._pending_entries()
+
+    def load_table(self) -> ScoreTable:
+        with self._write_lock:
+            table = self.repository.load_table()
+            table.extend(self._pending_entries())
+            return table
+
+    def refresh_scores(self) -> ScoreRefresh:
+        with self._write_lock:
+            result = self.repository.refresh_scores()
+            if result.reset:
+                result.entries = list(result.entries) + self._pending_entries()
+            return result
+
+    def save_score(self, entry: ScoreEntry) -> None:
+        with self._condition:
+            if self._closing:
+                # 閉じた後は裏のスレッドもジャーナルもないため、直接保存する
+                with self._write_lock:
+                    if not self.repository.save_scores([entry]):
+                        raise ScoreSaveError("スコアを保存できませんでした")
+                return
+            while len(self._pending) >= self.max_pending and self._thread.is_alive():
+                self._condition.wait()
+            self._sequence += 1
+            self._write_journal({"seq": self._sequence, "entry": asdict(entry)})
+            self._pending.append((self._sequence, entry))
+            self._condition.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """キューが空になるまで待つ。空になればTrueを返す"""
+        with self._condition:
+            self._condition.notify_all()
+            return self._condition.wait_for(lambda: not self._pending, timeout)
+
+    def close(self, timeout: float = 10.0) -> None:
+        """残りを保存して裏のスレッドを止める（保存しきれなかった分はジャーナルに残る）"""
+        with self._condition:
+            if self._closing:
+                return
+            self._closing = True
+            self._condition.notify_all()
+        self._thread.join(timeout)
+        sync = getattr(self.repository, "sync", None)
+        if sync is not None:
+            sync()
+        with self._condition:
+            self._journal.close()
+            finished = not self._pending
+            if finished:
+                # すべて保存済みならジャーナルを消す
+                # （残りがあれば、次に起動したプロセスが引き取る）
+                self._journal_file.unlink(missing_ok=True)
+            self._journal_lock.release()
+        if finished:
+            _remove_lock_file(self._journal_file)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._pending and not self._closing:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+                batch = list(islice(self._pending, self.batch_size))
+
+            with self._write_lock:
+                saved = self.repository.save_scores([entry for _, entry in batch])
+                if saved:
+                    with self._condition:
+                        for _ in batch:
+                            self._pending.popleft()
+                        self._commit_journal(batch[-1][0])
+                        self._condition.notify_all()
+
+            if not saved:
+                with self._condition:
+                    if self._closing:
+                        return
+                    self._condition.wait(self.retry_interval)
+
+    def _pending_entries(self) -> List[ScoreEntry]:
+        with self._condition:
+            return [entry for _, entry in self._pending]
+
+    def _write_journal(self, record: dict) -> None:
+        """_conditionを取得済みの前提で、ジャーナルに1行追記してディスクに反映"""
+        self._journal.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+
+    def _commit_journal(self, sequence: int) -> None:
+        """_conditionを取得済みの前提で、sequenceまで保存済みと記録する"""
+        if self._pending:
+            self._write_journal({"committed": sequence})
+        else:
+            # すべて保存済みなら空にする
+            # （このインスタンス専用のファイルなので、他のプロセスの分は消えない）
+            self._journal.truncate(0)
+            self._journal.seek(0)
+
+    def _adopt_journals(self) -> None:
+        """終了したプロセス（または以前の版の共有ジャーナル）の未保存分を引き取る
+
+        ロックが取れたジャーナルだけを対象にし、未保存のスコアを自分のジャーナルに書き写して
+        キューに積んでから元のファイルを消す。書き写しと削除の間で落ちた場合は、
+        そのスコアが2回保存されうる。
+        """
+        prefix = f"{self.journal_path.name}."
+        for path in sorted(self.journal_path.parent.iterdir()):
+            name = path.name
+            if path == self._journal_file or name.endswith(".lock"):
+                continue
+            if name != self.journal_path.name and not name.startswith(prefix):
+                continue
+            lock = FileLock(_lock_path(path))
+            if not lock.acquire(blocking=False):
+                # 持ち主のプロセスが使用中
+                continue
+            try:
+                if path.exists():
+                    self._adopt_journal(path)
+            finally:
+                lock.release()
+            _remove_lock_file(path)
+
+    def _adopt_journal(self, path: Path) -> None:
+        """ロック取得済みのジャーナルの未保存分を引き取り、元のファイルを消す"""
+        entries = _read_journal(path)
+        with self._condition:
+            for entry in entries:
+                self._sequence += 1
+                self._write_journal({"seq": self._sequence, "entry": asdict(entry)})
+                self._pending.append((self._sequence, entry))
+        path.unlink()
+        if entries:
+            print(f"ジャーナルから未保存のスコアを{len(entries)}件復元しました")
+
+
+def _lock_path(journal_file: Path) -> Path:
+    return journal_file.with_name(f"{journal_file.name}.lock")
+
+
+def _remove_lock_file(journal_file: Path) -> None:
+    """ジャーナルを消した後に、そのロックファイルを消す"""
+    try:
+        _lock_path(journal_file).unlink(missing_ok=True)
+    except OSError:
+        pass
+
+
+def _read_journal(path: Path) -> List[ScoreEntry]:
+    """ジャーナルのうち、保存済みと記録されていないスコア（記録順）"""
+    entries = {}
+    committed = 0
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # 書き込み途中で落ちた行は、呼び出し元に完了を返していないので捨てる
+                continue
+            if "committed" in record:
+                committed = max(committed, record["committed"])
+            else:
+                entries[record["seq"]] = ScoreEntry(**record["entry"])
+    return [entries[sequence] for sequence in sorted(entries) if sequence > committed]
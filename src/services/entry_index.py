@@ -0,0 +1,73 @@
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from ..models.score_entry import ScoreEntry
+from ..models.score_table import ScoreTable
+
+
+class EntryIndex:
+    """ニックネーム（形容詞と動物の組み合わせ）から最新の行番号を引く索引
+
+    キーは形容詞と動物のコードの組で、作成時はNumPyでまとめて求め、
+    以降はスコアの追加に合わせて1件ずつO(1)で更新する。
+    """
+
+    def __init__(self, table: ScoreTable):
+        self._lock = threading.Lock()
+        self._table = table
+        self._size = len(table)
+        self._rows: Dict[Tuple[int, int], int] = {}
+        if not self._size:
+            return
+
+        adjectives = table.codes("adjective").astype(np.int64) + 1
+        animals = table.codes("animal").astype(np.int64) + 1
+        stride = int(animals.max()) + 1
+        pairs = adjectives * stride + animals
+        # 末尾から見て最初に現れる位置が、そのニックネームの最新の行
+        unique, first = np.unique(pairs[::-1], return_index=True)
+        rows = self._size - 1 - first
+        for pair, row in zip(unique.tolist(), rows.tolist()):
+            adjective, animal = divmod(pair, stride)
+            self._rows[(adjective - 1, animal - 1)] = row
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, entry: ScoreEntry) -> None:
+        """テーブルに追加済みのエントリを索引に反映"""
+        with self._lock:
+            self._rows[self._key(entry.adjective, entry.animal)] = self._size
+            self._size += 1
+
+    def latest(self, table: ScoreTable, adjective: str, animal: str) -> Optional[int]:
+        """ニックネームの最新の行（tableは索引元のテーブルかそのsnapshot）"""
+        if not table.shares_rows_with(self._table):
+            # 作り直し前のテーブルなどは走査で探す
+            matches = np.flatnonzero(
+                (table.codes("adjective") == table.code_of("adjective", adjective))
+                & (table.codes("animal") == table.code_of("animal", animal))
+            )
+            return int(matches[-1]) if len(matches) else None
+        row = self._rows.get(self._key(adjective, animal))
+        if row is None or row >= len(table):
+            return None
+        return row
+
+    def find(self, table: ScoreTable, entry: ScoreEntry) -> Optional[int]:
+        """ニックネームとスコアが一致する行（tableは索引元のテーブルかそのsnapshot）"""
+        if table.shares_rows_with(self._table):
+            row = self.latest(table, entry.adjective, entry.animal)
+            if row is not None and table.scores[row] == entry.score:
+                return row
+        # 同じニックネームで別のスコアが後から登録された場合などは走査で探す
+        matches = np.flatnonzero(table.find(entry))
+        return int(matches[0]) if len(matches) else None
+
+    def _key(self, adjective: str, animal: str) -> Tuple[int, int]:
+        return (
+            self._table.code_of("adjective", adjective),
+            self._table.code_of("animal", animal),
+        )
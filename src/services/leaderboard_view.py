@@ -0,0 +1,268 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import (
+    Callable,
+    Dict,
+    FrozenSet,
+    Hashable,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+import numpy as np
+import pandas as pd
+
+from ..models.score_entry import ScoreEntry
+from ..models.score_table import ScoreTable
+from .leaderboard_window import leaderboard_rows, page_rows, sort_keys
+from .score_filter import FacetIndex, ScoreFilterService
+from .score_histogram import HistogramBins, ScoreHistogram
+from .score_quantiles import ScoreQuantiles
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class FilterKey:
+    """正規化したフィルタ条件（順序に依存せず、辞書のキーに使える）"""
+
+    categories: FrozenSet[str] = frozenset()
+    units: FrozenSet[str] = frozenset()
+    ages: FrozenSet[str] = frozenset()
+
+    @classmethod
+    def of(
+        cls,
+        categories: Iterable[str] = (),
+        units: Iterable[str] = (),
+        ages: Iterable[str] = (),
+    ) -> "FilterKey":
+        return cls(frozenset(categories), frozenset(units), frozenset(ages))
+
+    def __bool__(self) -> bool:
+        return bool(self.categories or self.units or self.ages)
+
+
+@dataclass
+class LeaderboardViewModel:
+    """1つのフィルタ条件に対するリーダーボードの表示内容
+
+    Streamlitに依存しない計算結果で、同じデータと条件であれば全セッションで共有できる。
+    ハイライトなどセッションごとに異なる部分は、保持した並べ替えキーを使って都度求める。
+    """
+
+    # 保持する組み立て結果の数の上限（ハイライトするスコアごとのグラフなど）
+    MAX_ARTIFACTS = 32
+
+    filters: FilterKey
+    # フィルタ適用後のスコアと、適用前の件数
+    scores: ScoreTable
+    total_count: int
+    # フィルタの選択肢（所属・部署・年齢）
+    filter_options: Dict[str, List[str]]
+    top_k: int
+    top_rows: np.ndarray
+    top_ranks: np.ndarray
+    bins: HistogramBins
+    histogram_frame: pd.DataFrame
+    # 表示中のスコアの分位点（中央値や上位10%の境目）
+    quantiles: ScoreQuantiles
+    keys: np.ndarray = field(repr=False)
+    # フィルタ適用後の各行の、適用前の行番号（フィルタなしの場合はNone）
+    source_rows: Optional[np.ndarray] = field(default=None, repr=False)
+    # 表示用に組み立てたもの（グラフなど）。同じ表示を見る全セッションで共有する
+    _artifacts: "OrderedDict[Hashable, object]" = field(
+        default_factory=OrderedDict, init=False, repr=False
+    )
+    _artifacts_lock: threading.Lock = field(
+        default_factory=threading.Lock, init=False, repr=False
+    )
+
+    @classmethod
+    def build(
+        cls,
+        scores: ScoreTable,
+        filters: Optional[FilterKey] = None,
+        facet_index: Optional[FacetIndex] = None,
+        histogram: Optional[ScoreHistogram] = None,
+        top_k: int = 20,
+        max_bars: int = 100,
+    ) -> "LeaderboardViewModel":
+        """スコアとフィルタ条件から表示内容を計算"""
+        if filters is None:
+            filters = FilterKey()
+        filter_service = ScoreFilterService(scores, facet_index)
+        scores = filter_service.scores
+        filter_options = {
+            "categories": filter_service.get_unique_categories(),
+            "units": filter_service.get_unique_units(),
+            "ages": filter_service.get_unique_ages(),
+        }
+
+        filtered_scores = scores
+        source_rows = None
+        if filters:
+            source_rows = np.flatnonzero(
+                filter_service.filter_mask(
+                    selected_categories=set(filters.categories),
+                    selected_units=set(filters.units),
+                    selected_ages=set(filters.ages),
+                )
+            )
+            filtered_scores = scores.take(source_rows)
+
+        # スコアごとの人数（フィルタなしの場合は共有のヒストグラムを使う）
+        if filters or histogram is None or len(histogram) != len(scores):
+            histogram = ScoreHistogram(filtered_scores.scores)
+        bins = histogram.bins(max_bars)
+
+        keys = sort_keys(filtered_scores.scores)
+        top_rows, top_ranks = leaderboard_rows(filtered_scores.scores, top_k, keys=keys)
+        return cls(
+            filters=filters,
+            scores=filtered_scores,
+            total_count=len(scores),
+            filter_options=filter_options,
+            top_k=top_k,
+            top_rows=top_rows,
+            top_ranks=top_ranks,
+            bins=bins,
+            histogram_frame=bins.to_frame(),
+            quantiles=histogram.quantiles(),
+            keys=keys,
+            source_rows=source_rows,
+        )
+
+    def highlight_row(self, entry: Optional[ScoreEntry]) -> Optional[int]:
+        """エントリの行（フィルタ結果に含まれない場合はNone）
+
+        索引がない場合の代替で、全行を走査する。通常はEntryIndexで求めた
+        フィルタ適用前の行番号をrow_of()で変換する。
+        """
+        if entry is None:
+            return None
+        matches = np.flatnonzero(self.scores.find(entry))
+        return int(matches[0]) if len(matches) else None
+
+    def row_of(self, source_row: Optional[int]) -> Optional[int]:
+        """フィルタ適用前の行番号を、この表示の行番号に変換（含まれない場合はNone）"""
+        if source_row is None:
+            return None
+        if self.source_rows is None:
+            return source_row if source_row < len(self.scores) else None
+        row = int(np.searchsorted(self.source_rows, source_row))
+        if row < len(self.source_rows) and self.source_rows[row] == source_row:
+            return row
+        return None
+
+    def leaderboard_rows(
+        self, highlight_row: Optional[int] = None, window: int = 0
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """上位top_k件と、ハイライト行の前後window件の行番号と順位
+
+        ハイライト行が上位に含まれなければ、全体を並べ替えずに部分選択で取り出す。
+        """
+        if highlight_row is None or highlight_row in self.top_rows:
+            return self.top_rows, self.top_ranks
+        return leaderboard_rows(
+            self.scores.scores, self.top_k, highlight_row, window, self.keys
+        )
+
+    def page_rows(self, page: int, page_size: int) -> Tuple[np.ndarray, np.ndarray]:
+        """順位順でpage（0始まり）ページ目の行番号と順位（部分選択で取り出す）"""
+        return page_rows(self.scores.scores, page, page_size, self.keys)
+
+    def ranking_frame(
+        self,
+        rows: np.ndarray,
+        ranks: np.ndarray,
+        highlight_row: Optional[int] = None,
+        marker: str = "",
+    ) -> pd.DataFrame:
+        """指定した行の順位表（ハイライト行は先頭の列にmarkerを付ける）"""
+        table = self.scores.take(rows)
+        return pd.DataFrame(
+            {
+                "": np.where(rows == highlight_row, marker, ""),
+                "順位": ranks,
+                "ニックネーム": table.nicknames(),
+                "所属": table.decode("category"),
+                "スコア": table.scores,
+                "部署": np.where(table.is_internal, table.decode("unit", "-"), "-"),
+                "年齢": table.decode("age", "-"),
+            }
+        )
+
+    def artifact(self, key: Hashable, build: Callable[[], T]) -> T:
+        """keyに対応する表示用の値（なければbuild()で作って保持）
+
+        グラフのように表示内容だけから決まる値を、データのバージョンとフィルタ条件ごとに
+        1回だけ組み立てる。保持する数がMAX_ARTIFACTSを超えたら、最も長く使われていないものから捨てる。
+        """
+        with self._artifacts_lock:
+            value = self._artifacts.get(key)
+            if value is not None:
+                self._artifacts.move_to_end(key)
+                return value
+
+        # 組み立て中はロックを持たない（同時に同じ値を作っても結果は同じ）
+        value = build()
+        with self._artifacts_lock:
+            self._artifacts[key] = value
+            self._artifacts.move_to_end(key)
+            while len(self._artifacts) > self.MAX_ARTIFACTS:
+                self._artifacts.popitem(last=False)
+        return value
+
+
+class LeaderboardViewCache:
+    """表示内容をデータのバージョンとフィルタ条件ごとに保持するLRUキャッシュ
+
+    多くの端末が同じ表示を見ている場合でも、計算はバージョンと条件ごとに1回で済む。
+    """
+
+    def __init__(self, max_size: int = 16):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._views: "OrderedDict[Hashable, LeaderboardViewModel]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._views)
+
+    def get(
+        self,
+        version: Hashable,
+        scores: ScoreTable,
+        filters: Optional[FilterKey] = None,
+        facet_index: Optional[FacetIndex] = None,
+        histogram: Optional[ScoreHistogram] = None,
+        top_k: int = 20,
+        max_bars: int = 100,
+    ) -> LeaderboardViewModel:
+        """versionのデータに対する表示内容（なければ計算して保持）
+
+        versionにはScoreStore.stampを、scoresはその時点のスナップショット（ScoreStore.snapshot()）を渡す。
+        """
+        if filters is None:
+            filters = FilterKey()
+        key = (version, filters, top_k, max_bars)
+        with self._lock:
+            view = self._views.get(key)
+            if view is not None:
+                self._views.move_to_end(key)
+                return view
+
+        # 計算中はロックを持たない（同時に同じ条件を計算しても結果は同じ）
+        view = LeaderboardViewModel.build(
+            scores, filters, facet_index, histogram, top_k, max_bars
+        )
+        with self._lock:
+            self._views[key] = view
+            self._views.move_to_end(key)
+            while len(self._views) > self.max_size:
+                self._views.popitem(last=False)
+        return view
@@ -0,0 +1,103 @@
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+
+# 並べ替え用のキー（-score * n + 行番号）がint64に収まる範囲
+_MAX_KEY = 2**62
+
+
+def sort_keys(scores: np.ndarray) -> np.ndarray:
+    """スコアの降順（同点は登録順）に並べるための重複のないキー"""
+    n = len(scores)
+    scores = scores.astype(np.int64)
+    if n and int(np.abs(scores).max()) * n < _MAX_KEY:
+        return -scores * n + np.arange(n, dtype=np.int64)
+    # キーが溢れる場合は、全体の順位をそのままキーにする
+    keys = np.empty(n, dtype=np.int64)
+    keys[np.lexsort((np.arange(n), -scores))] = np.arange(n, dtype=np.int64)
+    return keys
+
+
+def ranked_slice(
+    scores: np.ndarray, start: int, stop: int, keys: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """順位順に並べたときのstart番目からstop番目（含まない）までの行番号
+
+    全体を並べ替えずに、部分選択（argpartition）で必要な範囲だけを取り出す。
+    """
+    n = len(scores)
+    start, stop = max(start, 0), min(stop, n)
+    if start >= stop:
+        return np.array([], dtype=np.int64)
+    if keys is None:
+        keys = sort_keys(scores)
+
+    if stop - start == n:
+        rows = np.arange(n)
+    else:
+        kth = [start, stop - 1] if stop - 1 > start else [start]
+        rows = np.argpartition(keys, kth)[start:stop]
+    return rows[np.argsort(keys[rows])]
+
+
+def position_of(scores: np.ndarray, row: int, keys: Optional[np.ndarray] = None) -> int:
+    """行が順位順で何番目（0始まり）にあたるか"""
+    if keys is None:
+        keys = sort_keys(scores)
+    return int(np.count_nonzero(keys < keys[row]))
+
+
+def min_ranks(scores: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """指定した行の順位（同点は同順位）"""
+    targets = scores[rows]
+    unique = np.unique(targets)
+    # 各スコアより小さい対象スコアの種類数を数え、1回の走査で「より高い人数」を求める
+    below = np.searchsorted(unique, scores, side="left")
+    greater = np.cumsum(np.bincount(below, minlength=len(unique) + 1)[::-1])[::-1]
+    return greater[1:][np.searchsorted(unique, targets)] + 1
+
+
+def leaderboard_rows(
+    scores: np.ndarray,
+    top_k: int,
+    highlight_row: Optional[int] = None,
+    window: int = 0,
+    keys: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """上位top_k件と、ハイライト行の前後window件の行番号と順位
+
+    行番号は順位順に並び、上位とハイライト周辺が重なる場合は1つにまとめる。
+    """
+    if keys is None:
+        keys = sort_keys(scores)
+    ranges = [(0, top_k)]
+    if highlight_row is not None:
+        position = position_of(scores, highlight_row, keys)
+        if position >= top_k:
+            ranges.append((position - window, position + window + 1))
+    rows = np.concatenate(
+        [
+            ranked_slice(scores, start, stop, keys)
+            for start, stop in merge_ranges(ranges)
+        ]
+    )
+    return rows, min_ranks(scores, rows)
+
+
+def page_rows(
+    scores: np.ndarray, page: int, page_size: int, keys: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """順位順でpage（0始まり）ページ目の行番号と順位"""
+    rows = ranked_slice(scores, page * page_size, (page + 1) * page_size, keys)
+    return rows, min_ranks(scores, rows)
+
+
+def merge_ranges(ranges: Iterable[Tuple[int, int]]) -> list:
+    """重なる・隣接する範囲をまとめる"""
+    merged = []
+    for start, stop in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], stop))
+        else:
+            merged.append((start, stop))
+    return merged
@@ -0,0 +1,135 @@
+import random
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+class NicknameIndex:
+    """未使用の形容詞×動物の組み合わせを管理する索引
+
+    組み合わせを「形容詞の番号 × 動物の数 + 動物の番号」の整数で表し、
+    使用済みの集合だけを持つ。使用済みが少ないうちは棄却サンプリングで提案し、
+    使用率がDENSE_THRESHOLDを超えたら未使用の一覧を作って保持する（以降は一覧の
+    ランダムな位置から選ぶ）。使用済みの登録はO(1)、除外が少なければk件の提案はO(k)。
+    """
+
+    DENSE_THRESHOLD = 0.5
+    # 未使用の一覧から選ぶときの、1件あたりの試行回数の上限（超えたら一覧を絞り込む）
+    MAX_ATTEMPTS_PER_PICK = 4
+
+    def __init__(
+        self,
+        adjectives: Iterable[str],
+        animals: Iterable[str],
+        used: Iterable[Tuple[str, str]] = (),
+    ):
+        self._lock = threading.Lock()
+        self.adjectives = list(dict.fromkeys(adjectives))
+        self.animals = list(dict.fromkeys(animals))
+        self._adjective_ids = {adj: i for i, adj in enumerate(self.adjectives)}
+        self._animal_ids = {ani: i for i, ani in enumerate(self.animals)}
+        self._taken: Set[int] = set()
+        # 密になった後の未使用の一覧と、各組み合わせの一覧上の位置
+        self._free: Optional[List[int]] = None
+        self._free_positions: Dict[int, int] = {}
+        for adjective, animal in used:
+            self.mark_taken(adjective, animal)
+
+    @property
+    def capacity(self) -> int:
+        """組み合わせの総数"""
+        return len(self.adjectives) * len(self.animals)
+
+    @property
+    def remaining(self) -> int:
+        """未使用の組み合わせの数"""
+        return self.capacity - len(self._taken)
+
+    def matches(self, adjectives: Iterable[str], animals: Iterable[str]) -> bool:
+        """同じ語彙から作られた索引か"""
+        return self.adjectives == list(dict.fromkeys(adjectives)) and (
+            self.animals == list(dict.fromkeys(animals))
+        )
+
+    def is_taken(self, adjective: str, animal: str) -> bool:
+        pair_id = self._pair_id(adjective, animal)
+        return pair_id is not None and pair_id in self._taken
+
+    def mark_taken(self, adjective: str, animal: str) -> None:
+        """組み合わせを使用済みにする（語彙にない組み合わせは無視）"""
+        pair_id = self._pair_id(adjective, animal)
+        if pair_id is None:
+            return
+        with self._lock:
+            if pair_id in self._taken:
+                return
+            self._taken.add(pair_id)
+            if self._free is not None:
+                self._remove_free(pair_id)
+            elif len(self._taken) > self.capacity * self.DENSE_THRESHOLD:
+                self._free = [i for i in range(self.capacity) if i not in self._taken]
+                self._free_positions = {i: pos for pos, i in enumerate(self._free)}
+
+    def sample(
+        self, count: int, exclude: Iterable[Tuple[str, str]] = ()
+    ) -> List[Tuple[str, str]]:
+        """未使用の組み合わせをランダムにcount件（足りなければ全件）提案"""
+        excluded = {self._pair_id(adjective, animal) for adjective, animal in exclude}
+        with self._lock:
+            if self._free is not None:
+                picked = self._sample_free(count, excluded)
+            else:
+                # 未使用が半分以上あるので、1件あたり平均2回以内の試行で見つかる
+                available = self.remaining - len(excluded - self._taken - {None})
+                target = min(count, available)
+                picked_set = set()
+                while len(picked_set) < target:
+                    pair_id = random.randrange(self.capacity)
+                    if pair_id not in self._taken and pair_id not in excluded:
+                        picked_set.add(pair_id)
+                picked = list(picked_set)
+        return [self._pair(pair_id) for pair_id in picked]
+
+    def _sample_free(self, count: int, excluded: Set[Optional[int]]) -> List[int]:
+        """_lockを取得済みの前提で、未使用の一覧からexcludedを除いてcount件選ぶ
+
+        一覧のランダムな位置を選び、除外対象なら選び直す。除外が一覧の半分を超える場合や
+        試行回数が上限に達した場合だけ、一覧を絞り込んでから選ぶ。
+        """
+        free = self._free
+        blocked = len(excluded & self._free_positions.keys())
+        target = min(count, len(free) - blocked)
+        if blocked * 2 > len(free):
+            candidates = [i for i in free if i not in excluded]
+            return random.sample(candidates, target)
+
+        picked = set()
+        attempts = target * self.MAX_ATTEMPTS_PER_PICK
+        while len(picked) < target and attempts:
+            attempts -= 1
+            pair_id = free[random.randrange(len(free))]
+            if pair_id not in excluded:
+                picked.add(pair_id)
+        if len(picked) < target:
+            # 選べる件数が一覧に近い場合は重複が増えるため、残りを絞り込んだ一覧から選ぶ
+            candidates = [i for i in free if i not in excluded and i not in picked]
+            picked.update(random.sample(candidates, target - len(picked)))
+        return list(picked)
+
+    def _pair_id(self, adjective: str, animal: str) -> Optional[int]:
+        adjective_id = self._adjective_ids.get(adjective)
+        animal_id = self._animal_ids.get(animal)
+        if adjective_id is None or animal_id is None:
+            return None
+        return adjective_id * len(self.animals) + animal_id
+
+    def _pair(self, pair_id: int) -> Tuple[str, str]:
+        adjective_id, animal_id = divmod(pair_id, len(self.animals))
+        return self.adjectives[adjective_id], self.animals[animal_id]
+
+    def _remove_free(self, pair_id: int) -> None:
+        """未使用の一覧から末尾と入れ替えて削除（O(1)）"""
+        position = self._free_positions.pop(pair_id)
+        last = self._free.pop()
+        if last != pair_id:
+            self._free[position] = last
+            self._free_positions[last] = position
@@ -0,0 +1,83 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+Pair = Tuple[str, str]
+
+
+class NicknameReservations:
+    """フォームで提案中のニックネームの予約
+
+    提案したニックネームを一定時間（ttl秒）その利用者のために押さえ、他の端末には提案しない。
+    TTLは一定なので予約は期限の順にOrderedDictに並び、期限切れは先頭から取り除くだけで済む
+    （放置されたフォームの予約も、全件を走査せずに解放される）。
+    """
+
+    def __init__(self, ttl: float = 600.0, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        # 組み合わせ -> (予約した利用者, 期限)
+        self._entries: "OrderedDict[Pair, Tuple[str, float]]" = OrderedDict()
+        self._owned: Dict[str, Set[Pair]] = {}
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._expire()
+            return len(self._entries)
+
+    def reserve(self, owner: str, pairs: Iterable[Pair]) -> List[Pair]:
+        """ownerの予約をpairsに置き換え、予約できた組み合わせを返す
+
+        他の利用者が予約中の組み合わせは予約しない。
+        """
+        with self._lock:
+            self._expire()
+            self._release(owner)
+            expires_at = self._clock() + self.ttl
+            reserved = []
+            for pair in pairs:
+                if pair in self._entries:
+                    continue
+                self._entries[pair] = (owner, expires_at)
+                reserved.append(pair)
+            if reserved:
+                self._owned[owner] = set(reserved)
+            return reserved
+
+    def release(self, owner: str) -> None:
+        """ownerの予約をすべて解放"""
+        with self._lock:
+            self._release(owner)
+
+    def is_reserved_by_other(self, pair: Pair, owner: Optional[str]) -> bool:
+        """owner以外が予約中の組み合わせか（O(1)）"""
+        with self._lock:
+            self._expire()
+            reservation = self._entries.get(pair)
+            return reservation is not None and reservation[0] != owner
+
+    def reserved(self) -> List[Pair]:
+        """予約中の組み合わせ（期限切れを除く）"""
+        with self._lock:
+            self._expire()
+            return list(self._entries)
+
+    def _release(self, owner: str) -> None:
+        for pair in self._owned.pop(owner, ()):
+            self._entries.pop(pair, None)
+
+    def _expire(self) -> None:
+        """期限切れの予約を先頭から取り除く"""
+        now = self._clock()
+        while self._entries:
+            pair, (owner, expires_at) = next(iter(self._entries.items()))
+            if expires_at > now:
+                return
+            del self._entries[pair]
+            owned = self._owned.get(owner)
+            if owned is not None:
+                owned.discard(pair)
+                if not owned:
+                    del self._owned[owner]
@@ -0,0 +1,108 @@
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+from typing import ContextManager, Deque, Dict, Iterator, Tuple
+
+import numpy as np
+
+# 計測しないときに返す区間（何もしない）
+_NULL_SPAN = nullcontext()
+
+
+class PhaseTimer:
+    """1回の再実行（rerun）の処理区間ごとの所要時間を計測する
+
+    無効のときのspan()は何もしないコンテキストを返すだけなので、計測コストはほぼない。
+    trace_allocationsを有効にすると、区間内で増えたメモリ量（tracemalloc）も記録する。
+    """
+
+    def __init__(self, enabled: bool = False, trace_allocations: bool = False):
+        self.enabled = enabled
+        self.trace_allocations = enabled and trace_allocations
+        # 区間名ごとの所要時間（秒）と増えたメモリ量（バイト）。同じ名前は合算する
+        self.durations: Dict[str, float] = {}
+        self.allocations: Dict[str, int] = {}
+        if self.trace_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def span(self, name: str) -> ContextManager[None]:
+        """with文で囲んだ処理の所要時間をnameで記録する"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return self._measure(name)
+
+    @contextmanager
+    def _measure(self, name: str) -> Iterator[None]:
+        allocated = tracemalloc.get_traced_memory()[0] if self.trace_allocations else 0
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.durations[name] = self.durations.get(name, 0.0) + elapsed
+            if self.trace_allocations:
+                allocated = tracemalloc.get_traced_memory()[0] - allocated
+                self.allocations[name] = self.allocations.get(name, 0) + allocated
+
+
+class TimingLog:
+    """全セッションの計測結果を集計し、ローテーションするJSONLファイルに追記する
+
+    区間ごとに直近window件の所要時間を保持し、p50/p95を求める。
+    """
+
+    def __init__(
+        self,
+        file_path: str = "logs/timing.jsonl",
+        max_bytes: int = 5 * 1024 * 1024,
+        backup_count: int = 3,
+        window: int = 1000,
+    ):
+        self._lock = threading.Lock()
+        self._window = window
+        self._durations: Dict[str, Deque[float]] = {}
+
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+        handler = RotatingFileHandler(
+            file_path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        self._logger = logging.getLogger(f"{__name__}.{id(self)}")
+        self._logger.setLevel(logging.INFO)
+        self._logger.propagate = False
+        self._logger.addHandler(handler)
+
+    def record(self, timer: PhaseTimer) -> None:
+        """1回の再実行の計測結果を集計に加え、ログに追記"""
+        if not timer.durations:
+            return
+        with self._lock:
+            for name, seconds in timer.durations.items():
+                durations = self._durations.get(name)
+                if durations is None:
+                    durations = self._durations[name] = deque(maxlen=self._window)
+                durations.append(seconds)
+
+        record = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "durations": {name: round(s, 6) for name, s in timer.durations.items()},
+        }
+        if timer.trace_allocations:
+            record["allocations"] = timer.allocations
+        self._logger.info(json.dumps(record, ensure_ascii=False))
+
+    def percentiles(self) -> Dict[str, Tuple[float, float]]:
+        """区間ごとの所要時間（秒）のp50とp95"""
+        with self._lock:
+            samples = {name: list(values) for name, values in self._durations.items()}
+        return {
+            name: tuple(float(p) for p in np.percentile(values, [50, 95]))
+            for name, values in samples.items()
+        }
@@ -0,0 +1,68 @@
+import threading
+from bisect import bisect_left, bisect_right
+from typing import Iterable, List
+
+import numpy as np
+
+
+class RankIndex:
+    """スコアごとの人数を保持し、順位をO(log n)で求める索引
+
+    出現したスコアの種類を昇順に並べ、その人数をFenwick木で管理する。
+    同じスコアの追加はO(log n)、新しいスコアの追加はスコアの種類数に比例する。
+    """
+
+    def __init__(self, scores: Iterable[int] = ()):
+        self._lock = threading.Lock()
+        if not isinstance(scores, np.ndarray):
+            scores = np.fromiter(scores, dtype=np.int64)
+        keys, counts = np.unique(scores.astype(np.int64), return_counts=True)
+        self._keys: List[int] = keys.tolist()
+        self._counts: List[int] = counts.tolist()
+        self._total = int(counts.sum())
+        self._build()
+
+    def __len__(self) -> int:
+        return self._total
+
+    def add(self, score: int) -> None:
+        """スコアを1件追加"""
+        score = int(score)
+        with self._lock:
+            i = bisect_left(self._keys, score)
+            if i < len(self._keys) and self._keys[i] == score:
+                self._counts[i] += 1
+                j = i + 1
+                while j < len(self._tree):
+                    self._tree[j] += 1
+                    j += j & -j
+            else:
+                self._keys.insert(i, score)
+                self._counts.insert(i, 1)
+                self._build()
+            self._total += 1
+
+    def count_greater(self, score: int) -> int:
+        """scoreより高いスコアの人数"""
+        with self._lock:
+            return self._total - self._prefix(bisect_right(self._keys, score))
+
+    def rank(self, score: int) -> int:
+        """同点は同順位とした順位（1位から）"""
+        return self.count_greater(score) + 1
+
+    def _build(self) -> None:
+        tree = [0] + self._counts
+        for i in range(1, len(tree)):
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def _prefix(self, n: int) -> int:
+        """小さい方からn種類のスコアの人数の合計"""
+        total = 0
+        while n > 0:
+            total += self._tree[n]
+            n -= n & -n
+        return total
@@ -1,66 +1,274 @@
-from typing import List, Optional, Set
+from typing import Dict, List, Optional, Sequence, Set
+
+import numpy as np
 
 from ..models.score_entry import ScoreEntry
+from ..models.score_table import ScoreTable
+
+
+class FacetIndex:
+    """所属・部署・年齢の値ごとのビットマップ索引
+
+    値ごとに該当する行のビットを立てた配列（1行1ビット）を保持し、
+    同じ項目の中はOR、項目間はANDで絞り込む。スコアの追加に合わせて拡張する。
+    """
+
+    FACETS = ("category", "unit", "age")
+    INITIAL_CAPACITY = 1024
+
+    def __init__(self, table: ScoreTable):
+        self._table = table
+        self._size = len(table)
+        self._capacity = max(_round_up(self._size, 8), self.INITIAL_CAPACITY)
+        self._bitmaps: Dict[str, Dict[str, np.ndarray]] = {}
+        self._counts: Dict[str, Dict[str, int]] = {}
+        for facet in self.FACETS:
+            self._bitmaps[facet] = {}
+            self._counts[facet] = {}
+            codes = table.codes(facet)
+            values = table.values(facet)
+            counts = np.bincount(codes[codes >= 0], minlength=len(values))
+            for code in np.flatnonzero(counts):
+                self._bitmaps[facet][values[code]] = self._pack(codes == code)
+                self._counts[facet][values[code]] = int(counts[code])
+
+        # 部署の選択肢は社内のエントリだけから作る
+        unit_codes = table.codes("unit")[table.is_internal]
+        unit_counts = np.bincount(
+            unit_codes[unit_codes >= 0], minlength=len(table.values("unit"))
+        )
+        self._internal_units = {
+            table.values("unit")[code]: int(unit_counts[code])
+            for code in np.flatnonzero(unit_counts)
+        }
+
+    def __len__(self) -> int:
+        return self._size
+
+    def covers(self, table: ScoreTable) -> bool:
+        """tableの行をすべて索引に含んでいるか"""
+        return table.shares_rows_with(self._table) and len(table) <= self._size
+
+    def add(self, entry: ScoreEntry) -> None:
+        """追加されたエントリのビットを立てる"""
+        i = self._size
+        if i >= self._capacity:
+            self._grow()
+        for facet, value in (
+            ("category", entry.category),
+            ("unit", entry.unit),
+            ("age", entry.age),
+        ):
+            if not value:
+                continue
+            bitmap = self._bitmaps[facet].get(value)
+            if bitmap is None:
+                bitmap = np.zeros(self._capacity // 8, dtype=np.uint8)
+                self._bitmaps[facet][value] = bitmap
+            bitmap[i >> 3] |= 1 << (i & 7)
+            self._counts[facet][value] = self._counts[facet].get(value, 0) + 1
+        if entry.is_internal and entry.unit:
+            self._internal_units[entry.unit] = (
+                self._internal_units.get(entry.unit, 0) + 1
+            )
+        self._size = i + 1
+
+    def unique_values(self, facet: str) -> List[str]:
+        """1件以上存在する値（部署は社内のみ）"""
+        counts = self._internal_units if facet == "unit" else self._counts[facet]
+        return sorted(value for value, count in counts.items() if count)
+
+    def mask(
+        self,
+        selected_categories: Optional[Set[str]] = None,
+        selected_units: Optional[Set[str]] = None,
+        selected_ages: Optional[Set[str]] = None,
+        size: Optional[int] = None,
+    ) -> np.ndarray:
+        """条件に一致する先頭size行のマスク"""
+        size = self._size if size is None else size
+        packed = self._match(selected_categories, selected_units, selected_ages)
+        if packed is None:
+            return np.ones(size, dtype=bool)
+        return np.unpackbits(packed, count=size, bitorder="little").astype(bool)
+
+    def count(
+        self,
+        selected_categories: Optional[Set[str]] = None,
+        selected_units: Optional[Set[str]] = None,
+        selected_ages: Optional[Set[str]] = None,
+        size: Optional[int] = None,
+    ) -> int:
+        """条件に一致する先頭size行の件数（行は取り出さない）"""
+        size = self._size if size is None else size
+        packed = self._match(selected_categories, selected_units, selected_ages)
+        if packed is None:
+            return size
+        count = int(np.bitwise_count(packed[: size >> 3]).sum())
+        if size & 7:
+            count += int(packed[size >> 3] & ((1 << (size & 7)) - 1)).bit_count()
+        return count
+
+    def _match(
+        self,
+        selected_categories: Optional[Set[str]],
+        selected_units: Optional[Set[str]],
+        selected_ages: Optional[Set[str]],
+    ) -> Optional[np.ndarray]:
+        """条件に一致するビット列（条件がなければNone）"""
+        # _growは配列を差し替えてから容量を更新するため、容量を先に読めば、
+        # 拡張と重なっても読んだ配列はすべてwidth以上の長さがある
+        width = self._capacity // 8
+        bitmaps = self._bitmaps
+        conditions = []
+        if selected_categories:
+            conditions.append(_union(bitmaps["category"], selected_categories, width))
+        if selected_units:
+            conditions.append(_union(bitmaps["category"], {"社内"}, width))
+            conditions.append(_union(bitmaps["unit"], selected_units, width))
+        if selected_ages:
+            conditions.append(_union(bitmaps["age"], selected_ages, width))
+        if not conditions:
+            return None
+        return np.bitwise_and.reduce(conditions)
+
+    def _pack(self, mask: np.ndarray) -> np.ndarray:
+        bitmap = np.zeros(self._capacity // 8, dtype=np.uint8)
+        packed = np.packbits(mask, bitorder="little")
+        bitmap[: len(packed)] = packed
+        return bitmap
+
+    def _grow(self) -> None:
+        """容量を倍にする
+
+        全項目の新しい配列を作ってから1回の代入で差し替えるため、読み取り中のセッションは
+        古い配列か新しい配列のどちらか一方だけを見る（古い配列はそのまま残す）。
+        """
+        capacity = self._capacity * 2
+        grown: Dict[str, Dict[str, np.ndarray]] = {}
+        for facet in self.FACETS:
+            grown[facet] = {}
+            for value, bitmap in self._bitmaps[facet].items():
+                grown[facet][value] = np.zeros(capacity // 8, dtype=np.uint8)
+                grown[facet][value][: len(bitmap)] = bitmap
+        self._bitmaps = grown
+        self._capacity = capacity
 
 
 class ScoreFilterService:
-    """スコアデータをフィルタリングするサービスクラス"""
+    """スコアデータをフィルタリングするサービスクラス
+
+    facet_indexを渡した場合は、ビットマップ索引を使って絞り込む。
+    """
 
-    def __init__(self, scores: List[ScoreEntry]):
-        self.scores = scores
+    def __init__(
+        self,
+        scores: Sequence[ScoreEntry],
+        facet_index: Optional[FacetIndex] = None,
+    ):
+        self.scores = ScoreTable.as_table(scores)
+        if facet_index is not None and not facet_index.covers(self.scores):
+            facet_index = None
+        self.facet_index = facet_index
 
     def get_unique_categories(self) -> List[str]:
         """利用可能な所属カテゴリのリストを取得"""
-        categories = set()
-        for score in self.scores:
-            categories.add(score.category)
-        return sorted(list(categories))
+        if self.facet_index is not None:
+            return self.facet_index.unique_values("category")
+        return self._present_values("category")
 
     def get_unique_units(self) -> List[str]:
         """利用可能な部署のリストを取得（社内のみ）"""
-        units = set()
-        for score in self.scores:
-            if score.is_internal and score.unit:
-                units.add(score.unit)
-        return sorted(list(units))
+        if self.facet_index is not None:
+            return self.facet_index.unique_values("unit")
+        return self._present_values("unit", self.scores.is_internal)
 
     def get_unique_ages(self) -> List[str]:
         """利用可能な年齢のリストを取得"""
-        ages = set()
-        for score in self.scores:
-            if score.age:
-                ages.add(score.age)
-        return sorted(list(ages))
+        if self.facet_index is not None:
+            return self.facet_index.unique_values("age")
+        return self._present_values("age")
+
+    def count_scores(
+        self,
+        selected_categories: Optional[Set[str]] = None,
+        selected_units: Optional[Set[str]] = None,
+        selected_ages: Optional[Set[str]] = None,
+    ) -> int:
+        """フィルタ条件に一致する件数を取得"""
+        if self.facet_index is not None:
+            return self.facet_index.count(
+                selected_categories, selected_units, selected_ages, len(self.scores)
+            )
+        return int(
+            self.filter_mask(selected_categories, selected_units, selected_ages).sum()
+        )
 
     def filter_scores(
         self,
         selected_categories: Optional[Set[str]] = None,
         selected_units: Optional[Set[str]] = None,
         selected_ages: Optional[Set[str]] = None,
-    ) -> List[ScoreEntry]:
+    ) -> ScoreTable:
         """スコアをフィルタリング"""
-        filtered_scores = self.scores.copy()
+        return self.scores.select(
+            self.filter_mask(selected_categories, selected_units, selected_ages)
+        )
+
+    def filter_mask(
+        self,
+        selected_categories: Optional[Set[str]] = None,
+        selected_units: Optional[Set[str]] = None,
+        selected_ages: Optional[Set[str]] = None,
+    ) -> np.ndarray:
+        """フィルタ条件に一致する行のマスクを取得"""
+        if self.facet_index is not None:
+            return self.facet_index.mask(
+                selected_categories, selected_units, selected_ages, len(self.scores)
+            )
+
+        mask = np.ones(len(self.scores), dtype=bool)
 
         # カテゴリでフィルタリング
         if selected_categories:
-            filtered_scores = [
-                score
-                for score in filtered_scores
-                if score.category in selected_categories
-            ]
+            mask &= self._isin("category", selected_categories)
 
         # 部署でフィルタリング
         if selected_units:
-            filtered_scores = [
-                score
-                for score in filtered_scores
-                if score.is_internal and score.unit and score.unit in selected_units
-            ]
+            mask &= self.scores.is_internal & self._isin("unit", selected_units)
 
         # 年齢でフィルタリング
         if selected_ages:
-            filtered_scores = [
-                score for score in filtered_scores if score.age in selected_ages
-            ]
+            mask &= self._isin("age", selected_ages)
+
+        return mask
+
+    def _isin(self, name: str, selected: Set[str]) -> np.ndarray:
+        codes = [self.scores.code_of(name, value) for value in selected]
+        return np.isin(self.scores.codes(name), [c for c in codes if c >= 0])
+
+    def _present_values(
+        self, name: str, mask: Optional[np.ndarray] = None
+    ) -> List[str]:
+        """1件以上存在する値を並べ替えて取得"""
+        codes = self.scores.codes(name)
+        if mask is not None:
+            codes = codes[mask]
+        values = self.scores.values(name)
+        counts = np.bincount(codes[codes >= 0], minlength=len(values))
+        return sorted(values[code] for code in np.flatnonzero(counts))
+
+
+def _union(
+    bitmaps: Dict[str, np.ndarray], selected: Set[str], width: int
+) -> np.ndarray:
+    """選ばれた値のビット列のOR（先頭のwidthバイト）"""
+    result = np.zeros(width, dtype=np.uint8)
+    for value in selected:
+        if value in bitmaps:
+            result |= bitmaps[value][:width]
+    return result
+
 
-        return filtered_scores
+def _round_up(n: int, multiple: int) -> int:
+    return -(-n // multiple) * multiple
@@ -0,0 +1,132 @@
+import math
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .score_quantiles import ScoreQuantiles
+
+
+@dataclass
+class HistogramBins:
+    """グラフ表示用に階級ごとにまとめた人数"""
+
+    starts: np.ndarray
+    width: int
+    counts: np.ndarray
+    # その階級以上のスコアの人数の割合（上位何%か）
+    cumulative_percentages: np.ndarray
+
+    @property
+    def centers(self) -> np.ndarray:
+        return self.starts + (self.width - 1) / 2
+
+    def to_frame(self) -> pd.DataFrame:
+        cumulative_counts = np.cumsum(self.counts[::-1])[::-1]
+        return pd.DataFrame(
+            {
+                "スコア": self.centers if self.width > 1 else self.starts,
+                "人数": self.counts,
+                "累積人数": cumulative_counts,
+                "累積パーセンテージ": self.cumulative_percentages,
+            }
+        )
+
+
+class ScoreHistogram:
+    """スコアごとの人数を保持するヒストグラム
+
+    スコアの追加はO(1)で、出現したスコアだけを保持する（疎な表現）。
+    メモリは件数ではなくスコアの種類数で決まり、merge()で別のヒストグラムと合算できる
+    （ゲームやプロセスごとの集計をまとめる場合に使う）。
+    bins()ではスコアの範囲が棒の上限数を超える場合に階級幅を広げ、
+    外れ値があってもグラフの要素数が上限を超えないようにする。
+    """
+
+    def __init__(self, scores: Iterable[int] = ()):
+        self._lock = threading.Lock()
+        if not isinstance(scores, np.ndarray):
+            scores = np.fromiter(scores, dtype=np.int64)
+        keys, counts = np.unique(scores.astype(np.int64), return_counts=True)
+        self._counts: Dict[int, int] = dict(zip(keys.tolist(), counts.tolist()))
+        self._total = int(counts.sum())
+        self._sorted = None
+        self._quantiles: Optional[ScoreQuantiles] = None
+
+    @classmethod
+    def from_counts(
+        cls, keys: Iterable[int], counts: Iterable[int]
+    ) -> "ScoreHistogram":
+        """スコアとその人数から作成"""
+        histogram = cls()
+        for key, count in zip(keys, counts):
+            histogram._counts[int(key)] = histogram._counts.get(int(key), 0) + int(
+                count
+            )
+            histogram._total += int(count)
+        return histogram
+
+    def __len__(self) -> int:
+        return self._total
+
+    def add(self, score: int) -> None:
+        score = int(score)
+        with self._lock:
+            self._counts[score] = self._counts.get(score, 0) + 1
+            self._total += 1
+            self._sorted = None
+            self._quantiles = None
+
+    def merge(self, other: "ScoreHistogram") -> None:
+        """別のヒストグラムの人数を加える"""
+        with other._lock:
+            items = list(other._counts.items())
+        with self._lock:
+            for score, count in items:
+                self._counts[score] = self._counts.get(score, 0) + count
+                self._total += count
+            self._sorted = None
+            self._quantiles = None
+
+    def distribution(self) -> Tuple[np.ndarray, np.ndarray]:
+        """出現したスコア（昇順）とその人数"""
+        with self._lock:
+            return self._distribution()
+
+    def quantiles(self) -> ScoreQuantiles:
+        """分位点と順位の問い合わせ（次に追加されるまで同じオブジェクトを返す）"""
+        with self._lock:
+            if self._quantiles is None:
+                self._quantiles = ScoreQuantiles(*self._distribution())
+            return self._quantiles
+
+    def _distribution(self) -> Tuple[np.ndarray, np.ndarray]:
+        """_lockを取得済みの前提で、出現したスコア（昇順）とその人数"""
+        if self._sorted is None:
+            keys = np.array(sorted(self._counts), dtype=np.int64)
+            counts = np.array([self._counts[k] for k in keys.tolist()])
+            self._sorted = (keys, counts.astype(np.int64))
+        return self._sorted
+
+    def bins(self, max_bars: int) -> HistogramBins:
+        """階級ごとの人数と累積パーセンテージ（階級の数はmax_bars以下）"""
+        keys, counts = self.distribution()
+        if not len(keys):
+            empty = np.array([], dtype=np.int64)
+            return HistogramBins(empty, 1, empty, np.array([], dtype=float))
+
+        min_score, max_score = int(keys[0]), int(keys[-1])
+        width = max(1, math.ceil((max_score - min_score + 1) / max_bars))
+        bin_counts = np.bincount(
+            (keys - min_score) // width,
+            weights=counts,
+            minlength=(max_score - min_score) // width + 1,
+        ).astype(np.int64)
+        starts = min_score + np.arange(len(bin_counts), dtype=np.int64) * width
+
+        # 高い階級から累積した人数の割合
+        cumulative = np.cumsum(bin_counts[::-1])[::-1]
+        percentages = np.round(cumulative / cumulative[0] * 100, 1)
+        return HistogramBins(starts, width, bin_counts, percentages)
@@ -0,0 +1,46 @@
+import math
+from typing import Optional
+
+import numpy as np
+
+
+class ScoreQuantiles:
+    """ヒストグラムから求める正確な分位点と順位
+
+    出現したスコア（昇順）とその累積人数だけを持ち、各問い合わせは
+    スコアの種類数kに対する二分探索（O(log k)）で答える。スコアを並べ替えることはない。
+    """
+
+    def __init__(self, keys: np.ndarray, counts: np.ndarray):
+        self.keys = keys
+        # そのスコア以下の人数
+        self._cumulative = np.cumsum(counts)
+        self.total = int(self._cumulative[-1]) if len(counts) else 0
+
+    def __len__(self) -> int:
+        return self.total
+
+    def quantile(self, q: float) -> Optional[int]:
+        """下からq（0〜1）の位置のスコア（最近順位法。データがなければNone）"""
+        if not self.total:
+            return None
+        target = min(max(math.ceil(q * self.total), 1), self.total)
+        return int(self.keys[np.searchsorted(self._cumulative, target)])
+
+    def median(self) -> Optional[int]:
+        return self.quantile(0.5)
+
+    def count_above(self, score: int) -> int:
+        """scoreより高いスコアの人数"""
+        position = int(np.searchsorted(self.keys, score, side="right"))
+        return self.total - (int(self._cumulative[position - 1]) if position else 0)
+
+    def rank(self, score: int) -> int:
+        """同点を同順位とした順位（自分より高いスコアの人数 + 1）"""
+        return self.count_above(score) + 1
+
+    def top_percent(self, score: int) -> Optional[float]:
+        """scoreが上位何%か（データがなければNone）"""
+        if not self.total:
+            return None
+        return min(self.rank(score), self.total) / self.total * 100
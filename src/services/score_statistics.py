@@ -1,9 +1,14 @@
-from dataclasses import dataclass
-from typing import List, Optional
+import threading
+from dataclasses import asdict, dataclass
+from typing import Iterable, Optional, Sequence
 
-import pandas as pd
+import numpy as np
 
 from ..models.score_entry import ScoreEntry
+from ..models.score_table import ScoreTable
+from .rank_index import RankIndex
+from .score_histogram import ScoreHistogram
+from .score_quantiles import ScoreQuantiles
 
 
 @dataclass
@@ -12,67 +17,144 @@ class StatisticsResult:
     avg_score: float
     total_players: int
     top_player: ScoreEntry
+    median_score: Optional[int] = None
+    # 上位10%の境目のスコア（90パーセンタイル）
+    p90_score: Optional[int] = None
+
+
+class StatisticsAccumulator:
+    """スコアを追加するたびにO(1)で更新される集計値
+
+    件数・合計・最高点（とその最初のエントリ）・最低点・分散を保持する。
+    to_dict/from_dictで保存・復元できる。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0
+        self.max_score: Optional[int] = None
+        self.min_score: Optional[int] = None
+        self.top_player: Optional[ScoreEntry] = None
+        # Welford法による平均と偏差平方和
+        self._mean = 0.0
+        self._m2 = 0.0
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[ScoreEntry]) -> "StatisticsAccumulator":
+        accumulator = cls()
+        for entry in entries:
+            accumulator.add(entry)
+        return accumulator
+
+    @classmethod
+    def from_table(cls, table: ScoreTable) -> "StatisticsAccumulator":
+        accumulator = cls()
+        scores = table.scores
+        if not len(scores):
+            return accumulator
+        top = int(np.argmax(scores))
+        accumulator.count = len(scores)
+        accumulator.total = int(scores.sum())
+        accumulator.max_score = int(scores[top])
+        accumulator.min_score = int(scores.min())
+        accumulator.top_player = table[top]
+        accumulator._mean = accumulator.total / accumulator.count
+        accumulator._m2 = float(((scores - accumulator._mean) ** 2).sum())
+        return accumulator
+
+    def add(self, entry: ScoreEntry) -> None:
+        score = int(entry.score)
+        with self._lock:
+            self.count += 1
+            self.total += score
+            if self.max_score is None or score > self.max_score:
+                self.max_score = score
+                self.top_player = entry
+            if self.min_score is None or score < self.min_score:
+                self.min_score = score
+            delta = score - self._mean
+            self._mean += delta / self.count
+            self._m2 += delta * (score - self._mean)
+
+    @property
+    def variance(self) -> Optional[float]:
+        """母分散"""
+        return self._m2 / self.count if self.count else None
+
+    def result(self) -> Optional[StatisticsResult]:
+        with self._lock:
+            if not self.count:
+                return None
+            return StatisticsResult(
+                max_score=self.max_score,
+                avg_score=round(self.total / self.count, 1),
+                total_players=self.count,
+                top_player=self.top_player,
+            )
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "count": self.count,
+                "total": self.total,
+                "max_score": self.max_score,
+                "min_score": self.min_score,
+                "top_player": asdict(self.top_player) if self.top_player else None,
+                "mean": self._mean,
+                "m2": self._m2,
+            }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "StatisticsAccumulator":
+        accumulator = cls()
+        accumulator.count = data["count"]
+        accumulator.total = data["total"]
+        accumulator.max_score = data["max_score"]
+        accumulator.min_score = data["min_score"]
+        if data["top_player"]:
+            accumulator.top_player = ScoreEntry(**data["top_player"])
+        accumulator._mean = data["mean"]
+        accumulator._m2 = data["m2"]
+        return accumulator
 
 
 class ScoreStatistics:
-    def __init__(self, scores: List[ScoreEntry]):
+    def __init__(
+        self,
+        scores: Sequence[ScoreEntry],
+        rank_index: Optional[RankIndex] = None,
+        accumulator: Optional[StatisticsAccumulator] = None,
+        histogram: Optional[ScoreHistogram] = None,
+    ):
         self.scores = scores
+        self.rank_index = rank_index
+        self.accumulator = accumulator
+        self.histogram = histogram
 
     def calculate_statistics(self) -> Optional[StatisticsResult]:
-        if not self.scores:
-            return None
-
-        df = pd.DataFrame(
-            [
-                {
-                    "adjective": s.adjective,
-                    "animal": s.animal,
-                    "category": s.category,
-                    "score": s.score,
-                }
-                for s in self.scores
-            ]
-        )
-
-        max_score = df["score"].max()
-        avg_score = round(df["score"].mean(), 1)
-        total_players = len(df)
-        top_player_idx = df["score"].idxmax()
-        top_player_row = df.loc[top_player_idx]
-        top_player = ScoreEntry(
-            adjective=top_player_row["adjective"],
-            animal=top_player_row["animal"],
-            category=top_player_row["category"],
-            score=top_player_row["score"],
-        )
-
-        return StatisticsResult(
-            max_score=max_score,
-            avg_score=avg_score,
-            total_players=total_players,
-            top_player=top_player,
-        )
+        accumulator = self.accumulator
+        if accumulator is None:
+            accumulator = StatisticsAccumulator.from_table(
+                ScoreTable.as_table(self.scores)
+            )
+        result = accumulator.result()
+        if result is not None:
+            quantiles = self.quantiles()
+            result.median_score = quantiles.median()
+            result.p90_score = quantiles.quantile(0.9)
+        return result
+
+    def quantiles(self) -> ScoreQuantiles:
+        """分位点と順位の問い合わせ（ヒストグラムが渡されていればそれを使う）"""
+        histogram = self.histogram
+        if histogram is None:
+            histogram = ScoreHistogram(ScoreTable.as_table(self.scores).scores)
+        return histogram.quantiles()
 
     def calculate_rank(self, entry: ScoreEntry) -> tuple[int, int]:
-        df = pd.DataFrame(
-            [
-                {
-                    "adjective": s.adjective,
-                    "animal": s.animal,
-                    "nickname": s.nickname,
-                    "score": s.score,
-                }
-                for s in self.scores
-            ]
-        )
-        df_sorted = df.sort_values(by="score", ascending=False)
-        df_sorted["rank"] = df_sorted["score"].rank(method="min", ascending=False)
-        rank = int(
-            df_sorted[
-                (df_sorted["adjective"] == entry.adjective)
-                & (df_sorted["animal"] == entry.animal)
-                & (df_sorted["score"] == entry.score)
-            ]["rank"].iloc[0]
-        )
-        total = len(df_sorted)
-        return rank, total
+        # 同点は同順位（自分より高いスコアの人数 + 1位）
+        rank_index = self.rank_index
+        if rank_index is None:
+            rank_index = RankIndex(ScoreTable.as_table(self.scores).scores)
+        return rank_index.rank(entry.score), len(rank_index)
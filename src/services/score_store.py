@@ -0,0 +1,248 @@
+import itertools
+import threading
+import time
+from typing import Iterable, List, Optional, Tuple
+
+from ..models.score_entry import ScoreEntry
+from ..models.score_table import ScoreTable
+from ..repositories.score_repository import (
+    DuplicateNicknameError,
+    ScoreRepositoryInterface,
+)
+from ..repositories.snapshot_score_repository import SnapshotScoreRepository
+from ..repositories.sqlite_score_repository import SQLiteScoreRepository
+from ..repositories.write_behind_repository import WriteBehindScoreRepository
+from .entry_index import EntryIndex
+from .nickname_index import NicknameIndex
+from .nickname_reservation import NicknameReservations
+from .rank_index import RankIndex
+from .score_filter import FacetIndex
+from .score_statistics import StatisticsAccumulator, StatisticsResult
+from .segment_histograms import SegmentHistograms
+from .segment_leaderboard import SegmentLeaderboards
+
+# ストアごとの世代番号
+# （読み込み直したストアのバージョンが、前のストアと重ならないようにする）
+_generations = itertools.count(1)
+
+
+class ScoreStore:
+    """全セッションで共有するスコアデータのストア
+
+    プロセス内で1つだけ生成し、各セッションはscoresのスナップショットを参照する。
+    追加はロックで直列化し、データが変わるたびにversionを1つ進める。
+    """
+
+    def __init__(
+        self, repository: ScoreRepositoryInterface, reservation_ttl: float = 600.0
+    ):
+        self.repository = repository
+        # フォームで提案中のニックネーム（他の端末には提案しない）
+        self.reservations = NicknameReservations(reservation_ttl)
+        self._lock = threading.RLock()
+        self._table = repository.load_table()
+        self._build_indexes(self._saved_statistics())
+        self._generation = next(_generations)
+        self._version = 0
+        self._refreshed_at = time.monotonic()
+
+    @property
+    def game(self) -> str:
+        """このストアが保持するゲーム"""
+        return self.repository.game
+
+    @property
+    def nbytes(self) -> int:
+        """スコアのテーブルが使うメモリ量（バイト）"""
+        return self._table.nbytes
+
+    @property
+    def version(self) -> int:
+        """データのバージョン（単調増加）"""
+        return self._version
+
+    @property
+    def scores(self) -> ScoreTable:
+        """現時点のスコアのテーブル（コピーせずに共有する読み取り専用のビュー）"""
+        return self._table.snapshot()
+
+    @property
+    def stamp(self) -> Tuple[int, int]:
+        """データの版を表す値（ストアの世代番号とversionの組）
+
+        ストアを読み込み直しても前の値と重ならないため、キャッシュのキーや変更の検出に使える。
+        ロックを取らずに読めるので、自動更新で頻繁に確認しても負荷はほとんどない。
+        """
+        return self._generation, self._version
+
+    def snapshot(self) -> Tuple[Tuple[int, int], ScoreTable]:
+        """データの版（stamp）と、その時点のスコアのテーブル"""
+        with self._lock:
+            return self.stamp, self._table.snapshot()
+
+    def add(self, entry: ScoreEntry) -> None:
+        """スコアを保存し、ストアに追加（保存できなければScoreSaveErrorで、追加しない）"""
+        with self._lock:
+            self.repository.save_score(entry)
+            self._table.append(entry)
+            self._index_entry(entry)
+            self._version += 1
+
+    def add_unique(self, entry: ScoreEntry, owner: Optional[str] = None) -> None:
+        """ニックネームが未使用の場合だけスコアを保存し、ストアに追加
+
+        使用済みか、owner以外が予約中の場合はDuplicateNicknameErrorを送出する。
+        保存できたらownerの予約を解放する。
+        """
+        pair = (entry.adjective, entry.animal)
+        with self._lock:
+            if self.reservations.is_reserved_by_other(pair, owner):
+                raise DuplicateNicknameError(*pair)
+            self.repository.save_unique_score(entry, self._is_taken)
+            self._table.append(entry)
+            self._index_entry(entry)
+            self._version += 1
+        if owner is not None:
+            self.reservations.release(owner)
+
+    def calculate_rank(self, entry: ScoreEntry) -> Tuple[int, int]:
+        """同点は同順位とした順位と全体の人数
+
+        SQLiteに保存する場合はSQLで数えるため、他プロセスが追加してまだ取り込んでいない
+        スコアも含めて正確になる（それ以外は索引からO(log n)）。
+        """
+        repository = self._sql_repository()
+        if repository is not None:
+            rank = repository.calculate_rank(entry.score)
+            if rank is not None:
+                return rank
+        return self.rank_index.rank(entry.score), len(self.rank_index)
+
+    def calculate_statistics(self) -> Optional[StatisticsResult]:
+        """件数・平均点・最高点と、中央値・上位10%の境目
+
+        SQLiteに保存する場合は件数・平均点・最高点をSQLで集計する。
+        中央値・上位10%の境目はどの保存先でもヒストグラムから求める。
+        """
+        result = None
+        repository = self._sql_repository()
+        if repository is not None:
+            result = repository.calculate_statistics()
+        if result is None:
+            result = self.statistics.result()
+        if result is not None:
+            quantiles = self.histogram.quantiles()
+            result.median_score = quantiles.median()
+            result.p90_score = quantiles.quantile(0.9)
+        return result
+
+    def suggest_nicknames(
+        self,
+        adjectives: Iterable[str],
+        animals: Iterable[str],
+        owner: str,
+        count: int,
+    ) -> List[Tuple[str, str]]:
+        """未使用かつ他の利用者が予約していないニックネームを提案し、ownerの予約にする"""
+        index = self.nickname_index(adjectives, animals)
+        with self._lock:
+            self.reservations.release(owner)
+            suggested = index.sample(count, exclude=self.reservations.reserved())
+            return self.reservations.reserve(owner, suggested)
+
+    def refresh(self, max_age: float = 0.0) -> bool:
+        """他プロセスが追加したスコアを取り込む
+
+        max_age秒以内に確認済みであれば何もしない。データが変わった場合はTrueを返す。
+        """
+        if time.monotonic() - self._refreshed_at < max_age:
+            return False
+        with self._lock:
+            if time.monotonic() - self._refreshed_at < max_age:
+                return False
+            self._refreshed_at = time.monotonic()
+
+            result = self.repository.refresh_scores()
+            if result.reset:
+                self._table = ScoreTable.from_entries(result.entries, self.game)
+                self._build_indexes()
+            elif result.entries:
+                self._table.extend(result.entries)
+                for entry in result.entries:
+                    self._index_entry(entry)
+            else:
+                return False
+            self._version += 1
+            return True
+
+    def nickname_index(
+        self, adjectives: Iterable[str], animals: Iterable[str]
+    ) -> NicknameIndex:
+        """語彙に対応する未使用ニックネームの索引（語彙が変わったら作り直す）"""
+        adjectives, animals = list(adjectives), list(animals)
+        with self._lock:
+            index = self._nickname_index
+            if index is None or not index.matches(adjectives, animals):
+                used = zip(
+                    self._table.decode("adjective"), self._table.decode("animal")
+                )
+                index = NicknameIndex(adjectives, animals, used)
+                self._nickname_index = index
+            return index
+
+    def _sql_repository(self) -> Optional[SQLiteScoreRepository]:
+        """SQLで順位・集計を計算できるリポジトリ
+
+        保存を裏で行う場合は未保存のスコアがSQLに含まれないため、索引を使う。
+        """
+        if isinstance(self.repository, SQLiteScoreRepository):
+            return self.repository
+        return None
+
+    def _is_taken(self, adjective: str, animal: str) -> bool:
+        """ストアに取り込み済みのスコアでニックネームが使われているか（O(1)）"""
+        return self.entry_index.latest(self._table, adjective, animal) is not None
+
+    def _saved_statistics(self) -> Optional[StatisticsAccumulator]:
+        """スナップショットに保存された集計値に、その後の追記分を加えたもの
+
+        スナップショットから読み込まなかった場合はNone（全件から集計する）。
+        """
+        repository = self.repository
+        if isinstance(repository, WriteBehindScoreRepository):
+            repository = repository.repository
+        if not isinstance(repository, SnapshotScoreRepository):
+            return None
+        statistics = repository.snapshot_statistics
+        if statistics is None or statistics.count > len(self._table):
+            return None
+        for row in range(statistics.count, len(self._table)):
+            statistics.add(self._table[row])
+        return statistics
+
+    def _build_indexes(
+        self, statistics: Optional[StatisticsAccumulator] = None
+    ) -> None:
+        """全件から索引を作り直す（statisticsを渡した場合は集計値にそれを使う）"""
+        self.rank_index = RankIndex(self._table.scores)
+        if statistics is None:
+            statistics = StatisticsAccumulator.from_table(self._table)
+        self.statistics = statistics
+        self.facet_index = FacetIndex(self._table)
+        self.segment_histograms = SegmentHistograms(self._table)
+        self.histogram = self.segment_histograms.overall
+        self.segment_leaderboards = SegmentLeaderboards(self._table)
+        self.entry_index = EntryIndex(self._table)
+        # 語彙が必要なので、nickname_index()で最初に使うときに作る
+        self._nickname_index = None
+
+    def _index_entry(self, entry: ScoreEntry) -> None:
+        """追加されたエントリを索引に反映"""
+        self.rank_index.add(entry.score)
+        self.statistics.add(entry)
+        self.facet_index.add(entry)
+        self.segment_histograms.add(entry)
+        self.segment_leaderboards.add(entry)
+        self.entry_index.add(entry)
+        if self._nickname_index is not None:
+            self._nickname_index.mark_taken(entry.adjective, entry.animal)
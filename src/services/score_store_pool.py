@@ -0,0 +1,93 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+from .score_store import ScoreStore
+
+
+class ScoreStorePool:
+    """ゲームごとのScoreStoreを、使われたときに読み込んで保持する
+
+    読み込むのは選ばれたゲームだけで、他のゲームの件数は読み込み時間にもメモリにも影響しない。
+    保持するゲームがmax_stores件を超えるか、テーブルの合計がmax_bytesを超えたら、
+    最も長く使われていないゲームから破棄する（次に使われたときに読み込み直す）。
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[str], ScoreStore],
+        max_stores: int = 4,
+        max_bytes: Optional[int] = None,
+    ):
+        self.factory = factory
+        self.max_stores = max_stores
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._stores: "OrderedDict[str, ScoreStore]" = OrderedDict()
+        # 読み込み中のゲームごとのロック（別のゲームの読み込みは待たせない）
+        self._loading: Dict[str, threading.Lock] = {}
+
+    def __len__(self) -> int:
+        return len(self._stores)
+
+    def __contains__(self, game: str) -> bool:
+        return game in self._stores
+
+    @property
+    def games(self) -> List[str]:
+        """読み込み済みのゲーム（最近使われた順の逆）"""
+        with self._lock:
+            return list(self._stores)
+
+    def get(self, game: str) -> ScoreStore:
+        """ゲームのストア（読み込んでいなければ読み込む）"""
+        with self._lock:
+            store = self._stores.get(game)
+            if store is not None:
+                self._stores.move_to_end(game)
+                return store
+            loading = self._loading.setdefault(game, threading.Lock())
+
+        with loading:
+            with self._lock:
+                store = self._stores.get(game)
+            if store is None:
+                store = self.factory(game)
+            with self._lock:
+                self._stores[game] = store
+                self._stores.move_to_end(game)
+                self._loading.pop(game, None)
+                evicted = self._evict(keep=game)
+        for old in evicted:
+            _close(old)
+        return store
+
+    def evict(self, game: str) -> None:
+        """ゲームのストアを破棄"""
+        with self._lock:
+            store = self._stores.pop(game, None)
+        if store is not None:
+            _close(store)
+
+    def _evict(self, keep: str) -> List[ScoreStore]:
+        """_lockを取得済みの前提で、上限を超えた分を古い順に取り除く"""
+        evicted = []
+        while len(self._stores) > 1:
+            over_count = len(self._stores) > self.max_stores
+            over_bytes = self.max_bytes is not None and (
+                sum(store.nbytes for store in self._stores.values()) > self.max_bytes
+            )
+            if not over_count and not over_bytes:
+                break
+            game = next(iter(self._stores))
+            if game == keep:
+                break
+            evicted.append(self._stores.pop(game))
+        return evicted
+
+
+def _close(store: ScoreStore) -> None:
+    """破棄するストアのリポジトリに未保存の分があれば保存して閉じる"""
+    close = getattr(store.repository, "close", None)
+    if close is not None:
+        close()
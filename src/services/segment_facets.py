@@ -0,0 +1,17 @@
+from typing import Dict, List, Sequence, Tuple
+
+from ..models.score_entry import ScoreEntry
+
+# 所属・部署・年齢ごとの集計（SegmentHistograms・SegmentLeaderboards）で共有する項目名
+SEGMENT_LABELS: Dict[str, str] = {"category": "所属", "unit": "部署", "age": "年齢"}
+
+
+def segment_values(entry: ScoreEntry, facets: Sequence[str]) -> List[Tuple[str, str]]:
+    """エントリが属する（項目, 値）の組（空の値は除き、部署は社内のエントリのみ）"""
+    values = []
+    for facet in facets:
+        value = getattr(entry, facet)
+        if not value or (facet == "unit" and not entry.is_internal):
+            continue
+        values.append((facet, value))
+    return values
@@ -0,0 +1,112 @@
+import threading
+from dataclasses import dataclass
+from typing import ClassVar, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..models.score_entry import ScoreEntry
+from ..models.score_table import ScoreTable
+from .score_histogram import ScoreHistogram
+from .score_quantiles import ScoreQuantiles
+from .segment_facets import SEGMENT_LABELS, segment_values
+
+
+@dataclass
+class SegmentRank:
+    """所属・部署・年齢ごとの集団の中での順位"""
+
+    facet: str
+    label: str
+    value: str
+    rank: int
+    total: int
+    top_percent: float
+
+
+class SegmentHistograms:
+    """全体と、所属・部署・年齢の値ごとのスコアのヒストグラム
+
+    作成時は項目ごとに（値, スコア）の組をNumPyでまとめて数え、
+    以降はスコアの追加に合わせて該当するヒストグラムだけをO(1)で更新する。
+    分位点や「部署の中で上位何%か」は各ヒストグラムのquantiles()で答えるため、
+    問い合わせのたびに並べ替えることはない。
+    部署はScoreFilterServiceと同じく社内のエントリだけを対象にする。
+    """
+
+    FACETS: ClassVar[Tuple[str, ...]] = ("category", "unit", "age")
+    LABELS: ClassVar[Dict[str, str]] = SEGMENT_LABELS
+
+    def __init__(self, table: ScoreTable):
+        self._lock = threading.Lock()
+        self.overall = ScoreHistogram(table.scores)
+        self._segments: Dict[Tuple[str, str], ScoreHistogram] = {}
+
+        scores = table.scores.astype(np.int64)
+        if not len(scores):
+            return
+        min_score = int(scores.min())
+        span = int(scores.max()) - min_score + 1
+        for facet in self.FACETS:
+            codes = table.codes(facet).astype(np.int64)
+            mask = codes >= 0
+            if facet == "unit":
+                mask &= table.is_internal
+            # 値のコードとスコアを1つの整数にまとめて数える
+            pairs, counts = np.unique(
+                codes[mask] * span + (scores[mask] - min_score), return_counts=True
+            )
+            if not len(pairs):
+                continue
+            segment_codes, offsets = np.divmod(pairs, span)
+            values = table.values(facet)
+            boundaries = np.flatnonzero(np.diff(segment_codes)) + 1
+            for start, stop in zip(
+                np.r_[0, boundaries].tolist(), np.r_[boundaries, len(pairs)].tolist()
+            ):
+                value = values[int(segment_codes[start])]
+                self._segments[(facet, value)] = ScoreHistogram.from_counts(
+                    (offsets[start:stop] + min_score).tolist(),
+                    counts[start:stop].tolist(),
+                )
+
+    def add(self, entry: ScoreEntry) -> None:
+        """追加されたエントリを全体と該当する値のヒストグラムに反映"""
+        self.overall.add(entry.score)
+        for facet, value in segment_values(entry, self.FACETS):
+            histogram = self._segments.get((facet, value))
+            if histogram is None:
+                with self._lock:
+                    histogram = self._segments.setdefault(
+                        (facet, value), ScoreHistogram()
+                    )
+            histogram.add(entry.score)
+
+    def quantiles(
+        self, facet: Optional[str] = None, value: Optional[str] = None
+    ) -> ScoreQuantiles:
+        """全体（facetを省略した場合）または値ごとの分位点"""
+        if facet is None:
+            return self.overall.quantiles()
+        histogram = self._segments.get((facet, value))
+        if histogram is None:
+            return ScoreHistogram().quantiles()
+        return histogram.quantiles()
+
+    def ranks(self, entry: ScoreEntry) -> List[SegmentRank]:
+        """エントリの所属・部署・年齢それぞれの集団の中での順位"""
+        ranks = []
+        for facet, value in segment_values(entry, self.FACETS):
+            quantiles = self.quantiles(facet, value)
+            if not quantiles.total:
+                continue
+            ranks.append(
+                SegmentRank(
+                    facet=facet,
+                    label=self.LABELS[facet],
+                    value=value,
+                    rank=quantiles.rank(entry.score),
+                    total=quantiles.total,
+                    top_percent=quantiles.top_percent(entry.score),
+                )
+            )
+        return ranks
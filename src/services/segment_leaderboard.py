@@ -0,0 +1,132 @@
+import bisect
+import threading
+from dataclasses import dataclass, field
+from typing import ClassVar, Dict, List, Tuple
+
+import numpy as np
+
+from ..models.score_entry import ScoreEntry
+from ..models.score_table import ScoreTable
+from .segment_facets import SEGMENT_LABELS, segment_values
+
+
+@dataclass
+class SegmentSummary:
+    """部署または年齢の1つの値に属するエントリの成績"""
+
+    facet: str
+    value: str
+    count: int
+    avg_score: float
+    max_score: int
+    top_player: ScoreEntry
+    # 上位のエントリ（スコアの降順、同点は登録順）
+    top_entries: List[ScoreEntry] = field(default_factory=list)
+
+
+class _Group:
+    """1つの値の件数・合計と上位のエントリ"""
+
+    def __init__(self, count: int, total: int, top: List[ScoreEntry]):
+        self.count = count
+        self.total = total
+        self.top = top
+        # 上位のスコアの符号を反転した値（昇順、挿入位置の二分探索に使う）
+        self.negated = [-entry.score for entry in top]
+
+
+class SegmentLeaderboards:
+    """部署・年齢ごとの件数・平均点・最高点と上位top_n件
+
+    作成時は項目ごとに（値, スコアの降順）で1回だけ安定ソートし、値の境目から
+    件数・合計・上位の行をまとめて取り出す。以降はスコアの追加に合わせて該当する値だけを
+    O(top_n)で更新するため、部署どうしを比べる表示のためにフィルタを値ごとにかけ直す必要はない。
+    集計結果はsummaries()で次に追加されるまで同じものを返す。
+    部署はScoreFilterServiceと同じく社内のエントリだけを対象にする。
+    """
+
+    FACETS: ClassVar[Tuple[str, ...]] = ("unit", "age")
+    LABELS: ClassVar[Dict[str, str]] = SEGMENT_LABELS
+
+    def __init__(self, table: ScoreTable, top_n: int = 3):
+        self.top_n = top_n
+        self._lock = threading.Lock()
+        self._groups: Dict[str, Dict[str, _Group]] = {}
+        self._summaries: Dict[str, List[SegmentSummary]] = {}
+        scores = table.scores.astype(np.int64)
+        for facet in self.FACETS:
+            self._groups[facet] = self._build(table, facet, scores)
+
+    def _build(
+        self, table: ScoreTable, facet: str, scores: np.ndarray
+    ) -> Dict[str, _Group]:
+        codes = table.codes(facet).astype(np.int64)
+        mask = codes >= 0
+        if facet == "unit":
+            mask &= table.is_internal
+        rows = np.flatnonzero(mask)
+        if not len(rows):
+            return {}
+
+        # 値のコードとスコアの降順を1つの整数にまとめ、安定ソートで同点を登録順に保つ
+        selected = scores[rows]
+        max_score = int(selected.max())
+        span = max_score - int(selected.min()) + 1
+        order = rows[
+            np.argsort(codes[rows] * span + (max_score - selected), kind="stable")
+        ]
+        sorted_codes = codes[order]
+        starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+        stops = np.r_[starts[1:], len(order)]
+        totals = np.add.reduceat(scores[order], starts)
+
+        values = table.values(facet)
+        groups = {}
+        for start, stop, total in zip(starts.tolist(), stops.tolist(), totals.tolist()):
+            top = [table[int(row)] for row in order[start : start + self.top_n]]
+            groups[values[int(sorted_codes[start])]] = _Group(
+                stop - start, int(total), top
+            )
+        return groups
+
+    def add(self, entry: ScoreEntry) -> None:
+        """追加されたエントリを該当する部署・年齢の集計に反映"""
+        with self._lock:
+            for facet, value in segment_values(entry, self.FACETS):
+                group = self._groups[facet].get(value)
+                if group is None:
+                    self._groups[facet][value] = _Group(1, int(entry.score), [entry])
+                    continue
+                group.count += 1
+                group.total += int(entry.score)
+                # 同点なら先に登録されたエントリを上にする
+                position = bisect.bisect_right(group.negated, -entry.score)
+                if position < self.top_n:
+                    group.top.insert(position, entry)
+                    group.negated.insert(position, -entry.score)
+                    del group.top[self.top_n :]
+                    del group.negated[self.top_n :]
+            self._summaries.clear()
+
+    def summaries(self, facet: str) -> List[SegmentSummary]:
+        """値ごとの成績（平均点の高い順、同点は人数の多い順）"""
+        with self._lock:
+            summaries = self._summaries.get(facet)
+            if summaries is None:
+                summaries = sorted(
+                    (
+                        SegmentSummary(
+                            facet=facet,
+                            value=value,
+                            count=group.count,
+                            avg_score=round(group.total / group.count, 1),
+                            max_score=group.top[0].score,
+                            top_player=group.top[0],
+                            top_entries=list(group.top),
+                        )
+                        for value, group in self._groups[facet].items()
+                    ),
+                    key=lambda summary: (-summary.avg_score, -summary.count),
+                )
+                self._summaries[facet] = summaries
+            return summaries
@@ -0,0 +1,80 @@
+import csv
+import os
+import threading
+from dataclasses import dataclass
+from typing import ClassVar, Dict, List, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class Vocabulary:
+    """入力フォームで使う選択肢の一覧"""
+
+    adjectives: List[str]
+    animals: List[str]
+    units: List[str]
+    ages: List[str]
+    # 成績表を切り替えられるゲーム（先頭が既定）
+    games: List[str]
+
+
+class VocabularyLoader:
+    """選択肢のCSVをプロセス内で共有して読み込む
+
+    ファイルの更新日時（mtime）が変わったときだけ読み直し、それ以外はキャッシュを返す。
+    ファイルが見つからない・読めない場合は空の一覧とし、エラーは状態が変わるまで1回だけ出力する。
+    """
+
+    FILE_NAMES: ClassVar[Dict[str, str]] = {
+        "adjectives": "adjectives.csv",
+        "animals": "animals.csv",
+        "units": "units.csv",
+        "ages": "ages.csv",
+        "games": "games.csv",
+    }
+
+    def __init__(self, directory: str = "data"):
+        self.directory = directory
+        self._lock = threading.Lock()
+        # ファイルごとの (mtime_ns, 一覧)。ファイルがない場合のmtime_nsはNone
+        self._cache: Dict[str, Tuple[Optional[int], List[str]]] = {}
+        self._vocabulary: Optional[Vocabulary] = None
+
+    def load(self) -> Vocabulary:
+        """選択肢を取得（変更がなければ前回と同じオブジェクトを返す）"""
+        with self._lock:
+            changed = False
+            for name, file_name in self.FILE_NAMES.items():
+                changed |= self._refresh(name, os.path.join(self.directory, file_name))
+            if changed or self._vocabulary is None:
+                self._vocabulary = Vocabulary(
+                    **{name: self._cache[name][1] for name in self.FILE_NAMES}
+                )
+            return self._vocabulary
+
+    def _refresh(self, name: str, file_path: str) -> bool:
+        """ファイルが変わっていれば読み直す。一覧が変わった場合はTrueを返す"""
+        cached = self._cache.get(name)
+        error = None
+        try:
+            mtime_ns = os.stat(file_path).st_mtime_ns
+        except OSError as e:
+            mtime_ns, error = None, e
+        if cached is not None and cached[0] == mtime_ns:
+            return False
+
+        values: List[str] = []
+        if mtime_ns is not None:
+            try:
+                values = self._read(file_path)
+            except (OSError, csv.Error, ValueError) as e:
+                error = e
+        if error is not None:
+            print(f"CSVファイル読み込みエラー: {error}")
+        self._cache[name] = (mtime_ns, values)
+        return cached is None or cached[1] != values
+
+    def _read(self, file_path: str) -> List[str]:
+        with open(file_path, "r", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            next(reader, None)  # ヘッダーをスキップ
+            return [row[0] for row in reader if row]
@@ -1,26 +1,51 @@
-import csv
-import random
-from typing import Dict, List, Optional, Set, Tuple
+import math
+from typing import Callable, Dict, Hashable, List, Optional, Sequence, Set, Tuple
 
+import numpy as np
 import pandas as pd
-import plotly.express as px
+import plotly.graph_objects as go
 import streamlit as st
 
-from ..models.score_entry import ScoreEntry
-from ..services.score_filter import ScoreFilterService
+from ..models.score_entry import DEFAULT_GAME, ScoreEntry
+from ..models.score_table import ScoreTable
+from ..services.entry_index import EntryIndex
+from ..services.leaderboard_view import (
+    FilterKey,
+    LeaderboardViewCache,
+    LeaderboardViewModel,
+)
+from ..services.nickname_index import NicknameIndex
+from ..services.phase_timing import PhaseTimer
+from ..services.score_filter import FacetIndex
+from ..services.score_histogram import ScoreHistogram
 from ..services.score_statistics import StatisticsResult
+from ..services.segment_histograms import SegmentRank
+from ..services.segment_leaderboard import SegmentLeaderboards, SegmentSummary
+from ..services.vocabulary import Vocabulary
 
 
 class LeaderboardUI:
     HIGHLIGHT_COLOR = "#8B0000"
-    HIGHLIGHT_BACKGROUND = "rgba(255, 118, 118, 0.4)"
     HISTOGRAM_COLOR = "#aaaaaa"
     CELEBRATE_PERCENTILE = 50
     LEADERBOARD_HEIGHT = 250
+    # スコア分布の棒の数の上限（範囲が広い場合は階級幅を広げる）
+    HISTOGRAM_MAX_BARS = 100
+    # 順位表に表示する上位の件数と、自分の順位の前後に表示する件数
+    LEADERBOARD_TOP_K = 20
+    LEADERBOARD_WINDOW = 3
+    LEADERBOARD_PAGE_SIZE = 50
+    HIGHLIGHT_MARKER = "👉"
     DATAFRAME_FONT_SIZE = 100
+    # 未使用のニックネームの割合がこれを下回ったら警告する
+    NICKNAME_WARNING_RATIO = 0.1
 
-    def __init__(self):
-        st.set_page_config(page_title="【ボドゲ部】ジャマイカ成績表", layout="wide")
+    def __init__(self, timer: Optional[PhaseTimer] = None, game: str = DEFAULT_GAME):
+        # 処理区間ごとの所要時間の計測（指定がなければ計測しない）
+        self.timer = timer or PhaseTimer()
+        # 表示するゲーム（タイトルと登録するスコアに使う）
+        self.game = game
+        st.set_page_config(page_title=f"【ボドゲ部】{game}成績表", layout="wide")
 
         # タイトルの上の余白を調整とヘッダーを非表示
         st.markdown(
@@ -37,7 +62,7 @@ class LeaderboardUI:
             unsafe_allow_html=True,
         )
 
-        st.title("ジャマイカ成績表")
+        st.title(f"{game}成績表")
 
         # フィルタリング状態の初期化
         if "filter_categories" not in st.session_state:
@@ -49,65 +74,85 @@ class LeaderboardUI:
         if "show_filters" not in st.session_state:
             st.session_state["show_filters"] = False
 
+    def show_game_selector(self, games: List[str]):
+        """ゲームの切り替え（ゲームが1つの場合は表示しない）
+
+        選んだゲームはURLの?game=に反映し、次の再実行でそのゲームを表示する。
+        """
+        if len(games) < 2:
+            return
+
+        def select_game():
+            st.query_params["game"] = st.session_state["game_selectbox"]
+
+        st.sidebar.selectbox(
+            "ゲーム",
+            options=games,
+            index=games.index(self.game) if self.game in games else 0,
+            key="game_selectbox",
+            on_change=select_game,
+        )
+
     def show_statistics(self, stats: StatisticsResult):
         st.info(
             f"🏆 現在の記録\n\n"
             f"- 👑 1位: {stats.top_player.nickname}さん（{stats.max_score}点）\n"
             f"- 📊 平均点: {stats.avg_score}点\n"
-            f"- 👥 これまでの挑戦者: {stats.total_players}人\n\n"
-            f"あなたは何点取れるかな？ 👇"
+            f"- 👥 これまでの挑戦者: {stats.total_players}人\n"
+            + (
+                f"- 📈 中央値: {stats.median_score}点"
+                f"（上位10%は{stats.p90_score}点以上）\n"
+                if stats.median_score is not None
+                else ""
+            )
+            + "\nあなたは何点取れるかな？ 👇"
         )
 
-    def _load_csv_data(self, file_path: str) -> List[str]:
-        """CSVファイルからデータを読み込む"""
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                reader = csv.reader(f)
-                next(reader)  # ヘッダーをスキップ
-                return [row[0] for row in reader]
-        except Exception as e:
-            st.error(f"CSVファイル読み込みエラー: {e}")
-            return []
-
     def _get_used_combinations(
-        self, existing_entries: List[ScoreEntry]
+        self, existing_entries: Sequence[ScoreEntry]
     ) -> Set[Tuple[str, str]]:
         """既に使用されている形容詞と動物の組み合わせを取得"""
-        return {(entry.adjective, entry.animal) for entry in existing_entries}
-
-    def _suggest_combinations(
-        self,
-        adjectives: List[str],
-        animals: List[str],
-        used_combinations: Set[Tuple[str, str]],
-        count: int = 10,
-    ) -> List[Tuple[str, str]]:
-        """未使用の組み合わせをランダムに提案"""
-        all_combinations = [(adj, ani) for adj in adjectives for ani in animals]
-        available_combinations = [
-            comb for comb in all_combinations if comb not in used_combinations
-        ]
-
-        if len(available_combinations) <= count:
-            return available_combinations
-
-        return random.sample(available_combinations, count)
+        table = ScoreTable.as_table(existing_entries)
+        return set(zip(table.decode("adjective"), table.decode("animal")))
 
     def show_entry_form(
-        self, existing_entries: List[ScoreEntry]
+        self,
+        existing_entries: Sequence[ScoreEntry],
+        vocabulary: Vocabulary,
+        get_nickname_index: Optional[
+            Callable[[List[str], List[str]], NicknameIndex]
+        ] = None,
+        suggest_nicknames: Optional[Callable[[int], List[Tuple[str, str]]]] = None,
     ) -> Optional[ScoreEntry]:
-        # CSVからデータを読み込む
-        adjectives = self._load_csv_data("data/adjectives.csv")
-        animals = self._load_csv_data("data/animals.csv")
-        units = self._load_csv_data("data/units.csv")
-        ages = self._load_csv_data("data/ages.csv")
-
-        # 既に使用されている組み合わせを取得
-        used_combinations = self._get_used_combinations(existing_entries)
+        """スコア入力フォームを表示し、登録されたエントリを返す
+
+        suggest_nicknamesを渡すと、ニックネームの提案をそれに任せる
+        （他の端末と同じ組み合わせを提案しないよう、予約付きで提案する場合に使う）。
+        """
+        adjectives = vocabulary.adjectives
+        animals = vocabulary.animals
+        units = vocabulary.units
+        ages = vocabulary.ages
+
+        # 未使用の組み合わせの索引（渡されなければ既存のエントリから作る）
+        if get_nickname_index is not None:
+            nickname_index = get_nickname_index(adjectives, animals)
+        else:
+            nickname_index = NicknameIndex(
+                adjectives, animals, self._get_used_combinations(existing_entries)
+            )
 
         # フォームの外でカテゴリを選択
         st.sidebar.subheader("スコアを登録する")
 
+        # 残りのニックネームが少なくなったら、語彙を追加できるよう早めに知らせる
+        remaining = nickname_index.remaining
+        if 0 < remaining < nickname_index.capacity * self.NICKNAME_WARNING_RATIO:
+            st.sidebar.warning(
+                f"未使用のニックネームが残り{remaining}件"
+                f"（全{nickname_index.capacity}件）です。"
+            )
+
         # カテゴリ選択（フォームの外）
         if "category" not in st.session_state:
             st.session_state["category"] = "社内"
@@ -129,9 +174,10 @@ class LeaderboardUI:
             or not st.session_state["nickname_options"]
         ):
             # 未使用の組み合わせを10個提案
-            suggested_combinations = self._suggest_combinations(
-                adjectives, animals, used_combinations
-            )
+            if suggest_nicknames is not None:
+                suggested_combinations = suggest_nicknames(10)
+            else:
+                suggested_combinations = nickname_index.sample(10)
 
             nickname_options = []
             adjective_animal_map = {}
@@ -212,17 +258,67 @@ class LeaderboardUI:
                     score=score,
                     unit=unit if is_internal else None,
                     age=age,
+                    game=self.game,
                 )
             return None
 
-    def show_rank_result(self, rank: int, total: int):
-        percentile = 100 - int((total - rank) / total * 100)
+    def show_timing_panel(self, percentiles: Dict[str, Tuple[float, float]]):
+        """処理区間ごとの所要時間（計測が有効で、URLに?debug=1を付けたときだけ表示）"""
+        if not self.timer.enabled or st.query_params.get("debug") != "1":
+            return
+
+        rows = []
+        for name, seconds in self.timer.durations.items():
+            p50, p95 = percentiles.get(name, (seconds, seconds))
+            row = {
+                "区間": name,
+                "今回 (ms)": round(seconds * 1000, 1),
+                "p50 (ms)": round(p50 * 1000, 1),
+                "p95 (ms)": round(p95 * 1000, 1),
+            }
+            if self.timer.trace_allocations:
+                row["メモリ増加 (KB)"] = round(self.timer.allocations[name] / 1024, 1)
+            rows.append(row)
+
+        with st.sidebar.expander("処理時間（デバッグ）"):
+            st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+            st.caption("p50/p95は全セッションの直近の再実行から集計")
+
+    def show_duplicate_nickname(self, nickname: str):
+        st.error(
+            f"ニックネーム「{nickname}」は他の方が先に登録しました。"
+            "別のニックネームを選んで、もう一度登録してください。"
+        )
+
+    def show_save_error(self):
+        st.error(
+            "スコアを保存できませんでした。少し時間をおいて、もう一度登録してください。"
+        )
+
+    def show_rank_result(
+        self,
+        rank: int,
+        total: int,
+        top_percent: Optional[float] = None,
+        segment_ranks: Sequence[SegmentRank] = (),
+    ):
+        """順位と上位何%かを表示（segment_ranksがあれば所属・部署・年齢ごとの結果も表示）"""
+        if top_percent is None:
+            top_percent = rank / total * 100
+        percentile = _format_percent(top_percent)
+        segments = "".join(
+            f"\t👥 {segment.label}（{segment.value}）の中では"
+            f"{segment.total}人中{segment.rank}位、"
+            f"上位{_format_percent(segment.top_percent)}%\n\n"
+            for segment in segment_ranks
+        )
 
-        if percentile <= self.CELEBRATE_PERCENTILE:
+        if top_percent <= self.CELEBRATE_PERCENTILE:
             st.success(
                 "🎊 おめでとう！！！！ 🎊\n\n"
                 f"\t🏆 あなたの順位は{rank}位です！\n\n"
                 f"\t✨ あなたは上位{percentile}%です！ ✨\n\n"
+                f"{segments}"
                 f"\t🌟 素晴らしい成績です！ 🌟"
             )
             st.balloons()
@@ -231,13 +327,12 @@ class LeaderboardUI:
                 f"🎯 結果発表！\n\n"
                 f"\t🏅 あなたの順位は{rank}位です！\n\n"
                 f"\t📊 あなたは上位{percentile}%です！\n\n"
+                f"{segments}"
                 f"\t💪 次は更に上を目指そう！"
             )
             st.snow()
 
-    def _show_filter_controls(
-        self, filter_service: ScoreFilterService
-    ) -> Dict[str, Set[str]]:
+    def _show_filter_controls(self, filter_options: Dict[str, List[str]]) -> FilterKey:
         """フィルタリングコントロールを表示"""
         # フィルタ表示の切り替え
         show_filters = st.checkbox(
@@ -248,14 +343,14 @@ class LeaderboardUI:
         st.session_state["show_filters"] = show_filters
 
         if not show_filters:
-            return {"categories": set(), "units": set(), "ages": set()}
+            return FilterKey()
 
         st.subheader("フィルタ設定")
 
         # 利用可能なフィルタオプションを取得
-        categories = filter_service.get_unique_categories()
-        units = filter_service.get_unique_units()
-        ages = filter_service.get_unique_ages()
+        categories = filter_options["categories"]
+        units = filter_options["units"]
+        ages = filter_options["ages"]
 
         # フィルタコントロールを表示
         col1, col2, col3 = st.columns(3)
@@ -300,154 +395,85 @@ class LeaderboardUI:
             st.session_state["filter_ages"] = set()
             st.rerun()
 
-        return {
-            "categories": set(selected_categories),
-            "units": set(selected_units),
-            "ages": set(selected_ages),
-        }
+        return FilterKey.of(selected_categories, selected_units, selected_ages)
 
-    def show_leaderboard(
-        self, scores: List[ScoreEntry], highlight_entry: Optional[ScoreEntry] = None
+    def _show_ranking_table(
+        self,
+        view: LeaderboardViewModel,
+        rows: np.ndarray,
+        ranks: np.ndarray,
+        highlight_row: Optional[int] = None,
     ):
-        if not scores:
-            return
-
-        # フィルタリングサービスの初期化
-        filter_service = ScoreFilterService(scores)
-
-        # フィルタコントロールの表示
-        filters = self._show_filter_controls(filter_service)
-
-        # フィルタリングの適用
-        filtered_scores = scores
-        if any([filters["categories"], filters["units"], filters["ages"]]):
-            filtered_scores = filter_service.filter_scores(
-                selected_categories=filters["categories"],
-                selected_units=filters["units"],
-                selected_ages=filters["ages"],
-            )
-
-            if not filtered_scores:
-                st.warning(
-                    "フィルタ条件に一致するデータがありません。フィルタ条件を変更してください。"
-                )
-                return
-
-        df = pd.DataFrame(
-            [
-                {
-                    "ニックネーム": s.nickname,
-                    "所属": s.category,
-                    "スコア": s.score,
-                    "部署": s.unit if s.is_internal and s.unit else "-",
-                    "年齢": s.age if s.age else "-",
-                }
-                for s in filtered_scores
-            ]
+        """指定した行だけの順位表を表示（ハイライトは目印の列で示す）"""
+        st.dataframe(
+            view.ranking_frame(rows, ranks, highlight_row, self.HIGHLIGHT_MARKER),
+            height=self.LEADERBOARD_HEIGHT,
+            hide_index=True,
+            use_container_width=True,
+            column_config={
+                "": st.column_config.TextColumn(width="small"),
+                "順位": st.column_config.NumberColumn(format="%d位"),
+            },
         )
-        df_sorted = df.sort_values(by="スコア", ascending=False).reset_index(drop=True)
-
-        col1, col2 = st.columns(2)
-
-        with col1:
-            st.subheader("ランキング")
-            highlight_index = None
-            if highlight_entry:
-                mask = (
-                    (df_sorted["ニックネーム"] == highlight_entry.nickname)
-                    & (df_sorted["所属"] == highlight_entry.category)
-                    & (df_sorted["スコア"] == highlight_entry.score)
-                )
-                if mask.any():
-                    highlight_index = df_sorted[mask].index[0]
-
-            df_sorted = df_sorted.copy()
-            df_sorted.insert(
-                0,
-                "順位",
-                df_sorted["スコア"].rank(method="min", ascending=False).astype(int),
-            )
-
-            styled_df = df_sorted.style.apply(
-                lambda _: [
-                    f"background-color: {self.HIGHLIGHT_BACKGROUND}; border-left: 3px solid {self.HIGHLIGHT_COLOR}; font-weight: bold"
-                    if i == highlight_index
-                    else ""
-                    for i in range(len(df_sorted))
-                ],
-                axis=0,
-            ).format({"順位": "{:d}位"})
-
-            if len(df_sorted) > 20:
-                st.dataframe(
-                    styled_df,
-                    height=self.LEADERBOARD_HEIGHT,
-                    hide_index=True,
-                    use_container_width=True,
-                )
-            else:
-                st.dataframe(
-                    styled_df,
-                    height=self.LEADERBOARD_HEIGHT,
-                    hide_index=True,
-                    use_container_width=True,
-                )
-
-        with col2:
-            st.subheader("スコア分布")
-
-            # スコアの最小値と最大値を取得
-            min_score = int(df_sorted["スコア"].min())
-            max_score = int(df_sorted["スコア"].max())
-
-            # スコアごとの頻度を計算
-            score_counts = df_sorted["スコア"].value_counts().sort_index()
-
-            # 全てのスコア値（1刻み）を含むインデックスを作成
-            all_scores = pd.Series(range(min_score, max_score + 1))
 
-            # 欠損しているスコア値を0で埋める
-            score_counts = score_counts.reindex(all_scores, fill_value=0)
-
-            # データフレームに変換
-            score_df = pd.DataFrame(
-                {"スコア": score_counts.index, "人数": score_counts.values}
-            )
-
-            # 累積和と累積パーセンテージを計算
-            total_players = len(df_sorted)
-            score_df = score_df.sort_values("スコア", ascending=False)
-            score_df["累積人数"] = score_df["人数"].cumsum()
-            score_df["累積パーセンテージ"] = (
-                score_df["累積人数"] / total_players * 100
-            ).round(1)
-
-            # 棒グラフとライン（累積パーセンテージ）の2軸グラフを作成
-            fig = px.bar(
-                score_df.sort_values("スコア"),  # スコアの昇順にソート
-                x="スコア",
-                y="人数",
-                color_discrete_sequence=[self.HISTOGRAM_COLOR],
+    def _distribution_figure(
+        self, view: LeaderboardViewModel, highlight_score: Optional[int] = None
+    ) -> go.Figure:
+        """スコア分布の棒グラフと累積パーセンテージの2軸グラフ（表示内容ごとに共有）
+
+        共有するため、返したグラフは変更しないこと。
+        """
+        if highlight_score is not None:
+            return view.artifact(
+                ("distribution_figure", highlight_score),
+                lambda: self._highlight_figure(
+                    self._distribution_figure(view), highlight_score
+                ),
             )
+        return view.artifact(
+            ("distribution_figure", None), lambda: self._base_figure(view)
+        )
 
-            # 棒グラフに細めのborderを追加
-            fig.update_traces(marker=dict(line=dict(width=1, color="white")))
-
-            # 累積パーセンテージのラインを追加
-            fig2 = px.line(
-                score_df.sort_values("スコア"),  # スコアの昇順にソート
-                x="スコア",
-                y="累積パーセンテージ",
-                markers=True,  # マーカーを表示する
-            )
+    def _base_figure(self, view: LeaderboardViewModel) -> go.Figure:
+        """ハイライトなしのスコア分布のグラフ"""
+        # 階級ごとの人数と累積パーセンテージ（棒の数は上限以下）
+        bins = view.bins
+        score_df = view.histogram_frame
+        x = score_df["スコア"].to_numpy()
+        min_score = int(bins.starts[0])
+        max_score = int(bins.starts[-1]) + bins.width - 1
+
+        # 棒グラフ（細めの白いborder付き）とライン（累積パーセンテージ、2つ目のy軸）
+        bar = go.Bar(
+            x=x,
+            y=score_df["人数"].to_numpy(),
+            marker=dict(color=self.HISTOGRAM_COLOR, line=dict(width=1, color="white")),
+            hovertemplate="スコア=%{x}<br>人数=%{y}<extra></extra>",
+            showlegend=False,
+        )
+        line = go.Scatter(
+            x=x,
+            y=score_df["累積パーセンテージ"].to_numpy(),
+            mode="lines+markers",
+            yaxis="y2",
+            hovertemplate="スコア=%{x}<br>累積パーセンテージ=%{y}<extra></extra>",
+            showlegend=False,
+        )
 
-            # 2つのグラフを結合
-            for trace in fig2.data:
-                trace.yaxis = "y2"  # 2つ目のy軸を使用
-                fig.add_trace(trace)
+        xaxis = dict(title=dict(text="スコア"))
+        if max_score - min_score < 20:  # スコアの範囲が狭い場合は1刻みで表示
+            xaxis.update(tickmode="linear", dtick=1)
 
-            # 2つ目のy軸を設定
-            fig.update_layout(
+        return go.Figure(
+            data=[bar, line],
+            layout=dict(
+                xaxis=xaxis,
+                yaxis=dict(
+                    title=dict(text="人数"),
+                    showgrid=True,  # 棒グラフのグリッド線を表示
+                    gridcolor="lightgray",
+                    gridwidth=1,
+                ),
                 yaxis2=dict(
                     title=dict(
                         text="累積パーセンテージ (%)", font=dict(color="#1f77b4")
@@ -458,73 +484,185 @@ class LeaderboardUI:
                     side="right",
                     range=[0, 100],
                     showgrid=False,  # 累積パーセンテージのグリッド線を非表示
+                ),
+                height=self.LEADERBOARD_HEIGHT,
+                margin=dict(t=30, b=0, l=0, r=0),
+                bargap=0.1,
+                legend=dict(
+                    orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1
+                ),
+            ),
+        )
+
+    def _highlight_figure(self, base: go.Figure, score: int) -> go.Figure:
+        """共有のグラフの複製に、ハイライトエントリのスコアの縦線を重ねる"""
+        fig = go.Figure(base)
+        fig.add_vline(
+            x=score,
+            line_width=2,
+            line_color=self.HIGHLIGHT_COLOR,
+            annotation_text="あなたのスコア",
+            annotation_position="top",
+            annotation_font_size=14,
+            annotation_font_color=self.HIGHLIGHT_COLOR,
+            annotation_font_weight="bold",
+        )
+        return fig
+
+    def show_leaderboard(
+        self,
+        scores: Sequence[ScoreEntry],
+        highlight_entry: Optional[ScoreEntry] = None,
+        facet_index: Optional[FacetIndex] = None,
+        histogram: Optional[ScoreHistogram] = None,
+        version: Optional[Hashable] = None,
+        view_cache: Optional[LeaderboardViewCache] = None,
+        entry_index: Optional[EntryIndex] = None,
+    ):
+        """リーダーボードを表示
+
+        versionとview_cacheを渡すと、表示内容をデータのバージョンとフィルタ条件ごとに共有する。
+        entry_indexを渡すと、ハイライトエントリの行を全件走査せずに求める。
+        """
+        if not scores:
+            return
+        scores = ScoreTable.as_table(scores)
+
+        def get_view(filters: FilterKey) -> LeaderboardViewModel:
+            if view_cache is None or version is None:
+                return LeaderboardViewModel.build(
+                    scores,
+                    filters,
+                    facet_index,
+                    histogram,
+                    self.LEADERBOARD_TOP_K,
+                    self.HISTOGRAM_MAX_BARS,
                 )
+            return view_cache.get(
+                version,
+                scores,
+                filters,
+                facet_index,
+                histogram,
+                self.LEADERBOARD_TOP_K,
+                self.HISTOGRAM_MAX_BARS,
             )
 
-            if highlight_entry:
-                # ハイライトエントリがフィルタリング結果に含まれているか確認
-                highlight_in_filtered = any(
-                    s.adjective == highlight_entry.adjective
-                    and s.animal == highlight_entry.animal
-                    and s.score == highlight_entry.score
-                    for s in filtered_scores
+        with self.timer.span("leaderboard.view"):
+            # フィルタなしの表示内容（フィルタの選択肢もここから取る）
+            view = get_view(FilterKey())
+
+        with self.timer.span("leaderboard.filter"):
+            # フィルタコントロールの表示
+            filters = self._show_filter_controls(view.filter_options)
+
+        # フィルタリングの適用
+        is_filtered = bool(filters)
+        if is_filtered:
+            with self.timer.span("leaderboard.view"):
+                view = get_view(filters)
+
+            if not view.scores:
+                st.warning(
+                    "フィルタ条件に一致するデータがありません。フィルタ条件を変更してください。"
                 )
+                return
 
-                if highlight_in_filtered:
-                    # ハイライトエントリのスコアに対応する累積パーセンテージを取得
-                    highlight_score = highlight_entry.score
-                    highlight_percentile = score_df[
-                        score_df["スコア"] >= highlight_score
-                    ]["累積パーセンテージ"].min()
-
-                    # ハイライトエントリの位置に縦線を追加
-                    fig.add_vline(
-                        x=highlight_entry.score,
-                        line_width=2,
-                        line_color=self.HIGHLIGHT_COLOR,
-                        annotation_text="あなたのスコア",
-                        annotation_position="top",
-                        annotation_font_size=14,
-                        annotation_font_color=self.HIGHLIGHT_COLOR,
-                        annotation_font_weight="bold",
-                    )
+        # ハイライトエントリの行（フィルタ結果に含まれない場合はNone）
+        if entry_index is not None and highlight_entry is not None:
+            highlight_row = view.row_of(entry_index.find(scores, highlight_entry))
+        else:
+            highlight_row = view.highlight_row(highlight_entry)
 
-            # グラフのレイアウト設定
-            fig.update_layout(
-                xaxis_title="スコア",
-                yaxis_title="人数",
-                height=self.LEADERBOARD_HEIGHT,
-                margin=dict(t=30, b=0, l=0, r=0),
-                bargap=0.1,  # バー間のギャップを小さく
-                yaxis=dict(
-                    showgrid=True,  # 棒グラフのグリッド線を表示
-                    gridcolor="lightgray",  # グリッド線の色
-                    gridwidth=1,  # グリッド線の幅
-                ),
-            )
+        col1, col2 = st.columns(2)
 
-            # X軸の設定を別途行う
-            if max_score - min_score < 20:  # スコアの範囲が狭い場合は1刻みで表示
-                fig.update_xaxes(tickmode="linear", dtick=1)
+        with col1, self.timer.span("leaderboard.ranking"):
+            st.subheader("ランキング")
 
-            # 凡例の設定
-            fig.update_layout(
-                legend=dict(
-                    orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1
+            # 上位とハイライト周辺の行だけを表示
+            rows, ranks = view.leaderboard_rows(highlight_row, self.LEADERBOARD_WINDOW)
+            self._show_ranking_table(view, rows, ranks, highlight_row)
+
+            # 残りの順位はページ単位で表示
+            if len(view.scores) > len(rows):
+                with st.expander("すべての順位を見る"):
+                    pages = -(-len(view.scores) // self.LEADERBOARD_PAGE_SIZE)
+                    page = st.number_input(
+                        f"ページ（全{pages}ページ）",
+                        min_value=1,
+                        max_value=pages,
+                        value=1,
+                        step=1,
+                        key="leaderboard_page",
+                    )
+                    rows, ranks = view.page_rows(
+                        int(page) - 1, self.LEADERBOARD_PAGE_SIZE
+                    )
+                    self._show_ranking_table(view, rows, ranks, highlight_row)
+
+        with col2:
+            st.subheader("スコア分布")
+
+            with self.timer.span("leaderboard.figure"):
+                # グラフは表示内容ごとに1回だけ組み立てて全セッションで共有し、
+                # ハイライトの縦線はスコアごとに重ねたものを共有する
+                highlight_score = (
+                    int(highlight_entry.score) if highlight_row is not None else None
                 )
-            )
+                fig = self._distribution_figure(view, highlight_score)
 
-            st.plotly_chart(fig, use_container_width=True)
+            with self.timer.span("leaderboard.chart"):
+                st.plotly_chart(fig, use_container_width=True)
 
             # フィルタリング情報の表示
-            if any([filters["categories"], filters["units"], filters["ages"]]):
+            if is_filtered:
                 filter_info = []
-                if filters["categories"]:
-                    filter_info.append(f"所属: {', '.join(filters['categories'])}")
-                if filters["units"]:
-                    filter_info.append(f"部署: {', '.join(filters['units'])}")
-                if filters["ages"]:
-                    filter_info.append(f"年齢: {', '.join(filters['ages'])}")
+                if filters.categories:
+                    filter_info.append(f"所属: {', '.join(filters.categories)}")
+                if filters.units:
+                    filter_info.append(f"部署: {', '.join(filters.units)}")
+                if filters.ages:
+                    filter_info.append(f"年齢: {', '.join(filters.ages)}")
 
                 st.caption(f"フィルタ適用中: {' / '.join(filter_info)}")
-                st.caption(f"表示件数: {len(filtered_scores)}件 / 全{len(scores)}件")
+                st.caption(f"表示件数: {len(view.scores)}件 / 全{view.total_count}件")
+                st.caption(
+                    f"中央値: {view.quantiles.median()}点 / "
+                    f"上位10%: {view.quantiles.quantile(0.9)}点以上"
+                )
+
+    def show_segment_leaderboards(self, summaries: Dict[str, List[SegmentSummary]]):
+        """部署・年齢ごとの人数・平均点・最高点と上位のエントリを並べて表示"""
+        facets = [
+            facet for facet, facet_summaries in summaries.items() if facet_summaries
+        ]
+        if not facets:
+            return
+
+        with st.expander("部署・年齢ごとの成績"):
+            tabs = st.tabs([SegmentLeaderboards.LABELS[facet] for facet in facets])
+            for tab, facet in zip(tabs, facets):
+                rows = [
+                    {
+                        SegmentLeaderboards.LABELS[facet]: summary.value,
+                        "人数": summary.count,
+                        "平均点": summary.avg_score,
+                        "最高点": summary.max_score,
+                        "上位": "、".join(
+                            f"{entry.nickname}（{entry.score}点）"
+                            for entry in summary.top_entries
+                        ),
+                    }
+                    for summary in summaries[facet]
+                ]
+                with tab:
+                    st.dataframe(
+                        pd.DataFrame(rows), hide_index=True, use_container_width=True
+                    )
+
+
+def _format_percent(percent: float) -> str:
+    """上位何%かの表示（10%未満は小数第1位まで、それ以上は切り上げた整数）"""
+    if percent < 10:
+        return f"{math.ceil(percent * 10) / 10:g}"
+    return str(math.ceil(percent))